@@ -3,11 +3,11 @@ Admin Commands Handler
 """
 
 import logging
+from functools import lru_cache
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from utils import is_admin, format_file_size
+from utils import is_admin, format_file_size, forget_access
 from config import Config
-import asyncio
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +19,7 @@ async def stats_command(client: Client, message: Message):
     """Show bot statistics"""
     try:
         stats = await client.db.get_stats()
-        total_size = await client.db.get_total_size()
+        total_size = stats['total_size']
         user_count = await client.db.get_user_count()
         
         stats_text = f"""
@@ -49,6 +49,17 @@ async def stats_command(client: Client, message: Message):
         stats_text += f"• Max Results: {Config.MAX_RESULTS}\n"
         stats_text += f"• Caption Filter: {'✅' if Config.USE_CAPTION_FILTER else '❌'}\n"
         
+        cache_stats = client.db.search_cache.stats()
+        stats_text += f"\n<b>⚡ Search Cache:</b>\n"
+        stats_text += f"• Entries: {cache_stats['entries']:,}/{Config.SEARCH_CACHE_SIZE:,}\n"
+        stats_text += f"• Hits: {cache_stats['hits']:,} • Misses: {cache_stats['misses']:,}\n"
+        stats_text += f"• Hit Rate: {cache_stats['hit_rate']:.1%}\n"
+        stats_text += f"• Coalesced Searches: {client.db.search_flights.shared:,}\n"
+        
+        stats_text += f"\n<b>📈 Search Analytics:</b>\n"
+        stats_text += f"• Logged: {client.analytics.flushed:,} • Queued: {client.analytics.queue.qsize():,}\n"
+        stats_text += f"• Dropped: {client.analytics.dropped:,}\n"
+        
         await message.reply(stats_text)
         
     except Exception as e:
@@ -60,7 +71,7 @@ async def total_command(client: Client, message: Message):
     """Show total files count"""
     try:
         stats = await client.db.get_stats()
-        total_size = await client.db.get_total_size()
+        total_size = stats['total_size']
         
         await message.reply(
             f"📊 <b>Total Files:</b> {stats['total_files']:,}\n"
@@ -74,52 +85,25 @@ async def total_command(client: Client, message: Message):
 @Client.on_message(filters.command("broadcast") & admin_filter)
 async def broadcast_command(client: Client, message: Message):
     """Broadcast message to all users"""
+    args = message.text.split()
+    
+    if len(args) > 1 and args[1].lower() == "cancel":
+        if client.broadcasts.cancel():
+            await message.reply("🛑 Cancelling the broadcast...")
+        else:
+            await message.reply("❌ No broadcast is running.")
+        return
+    
     if not message.reply_to_message:
         await message.reply("❌ Reply to a message to broadcast it.")
         return
     
-    # Get all unique user IDs from database (if you store user data)
-    # For now, we'll use a simple approach with AUTH_USERS
-    users = Config.AUTH_USERS + Config.ADMINS
-    
-    if not users:
-        await message.reply("❌ No users found to broadcast to.")
+    if client.broadcasts.running:
+        await message.reply("⏳ A broadcast is already running. Use <code>/broadcast cancel</code> to stop it.")
         return
     
-    broadcast_msg = message.reply_to_message
-    success_count = 0
-    failed_count = 0
-    
     status_msg = await message.reply("📡 <b>Broadcasting...</b>\n\n⏳ Starting broadcast...")
-    
-    for user_id in users:
-        try:
-            await broadcast_msg.copy(user_id)
-            success_count += 1
-            
-            # Update status every 10 users
-            if (success_count + failed_count) % 10 == 0:
-                await status_msg.edit_text(
-                    f"📡 <b>Broadcasting...</b>\n\n"
-                    f"✅ Sent: {success_count}\n"
-                    f"❌ Failed: {failed_count}\n"
-                    f"⏳ Progress: {success_count + failed_count}/{len(users)}"
-                )
-            
-            # Sleep to avoid flood limits
-            await asyncio.sleep(0.1)
-            
-        except Exception as e:
-            failed_count += 1
-            logger.error(f"Failed to send broadcast to {user_id}: {e}")
-    
-    # Final status
-    await status_msg.edit_text(
-        f"📡 <b>Broadcast Complete!</b>\n\n"
-        f"✅ Successfully sent: {success_count}\n"
-        f"❌ Failed: {failed_count}\n"
-        f"📊 Total users: {len(users)}"
-    )
+    await client.broadcasts.start(message.reply_to_message, status_msg)
 
 @Client.on_message(filters.command("ban") & admin_filter)
 async def ban_command(client: Client, message: Message):
@@ -135,6 +119,7 @@ async def ban_command(client: Client, message: Message):
         
         # Add to banned users
         await client.db.ban_user(user_id)
+        forget_access(user_id)
         await message.reply(f"✅ User {user_id} has been banned from using the bot.")
             
     except ValueError:
@@ -157,6 +142,7 @@ async def unban_command(client: Client, message: Message):
         
         # Remove from banned users
         await client.db.unban_user(user_id)
+        forget_access(user_id)
         await message.reply(f"✅ User {user_id} has been unbanned and can now use the bot.")
             
     except ValueError:
@@ -204,17 +190,21 @@ async def commands_command(client: Client, message: Message):
 <b>📊 Statistics & Analytics:</b>
 • <code>/stats</code> - View comprehensive bot statistics
 • <code>/total</code> - Show total files count and storage size
-• <code>/top10</code> - Show top searched movies & active users
-• <code>/notfound</code> - Show most searched unavailable videos
+• <code>/top10 [days|&lt;hours&gt;h|live]</code> - Show top searched movies & active users
+• <code>/notfound [days|&lt;hours&gt;h|live]</code> - Show most searched unavailable videos
 
 <b>📁 Media Management:</b>
-• <code>/index &lt;channel_id&gt; [limit]</code> - Manually index channel messages
+• <code>/index &lt;channel_id|all&gt; [reset]</code> - Index channel history in the background
+• <code>/resolve [channel_id]</code> - Fetch file ids for media imported from exports
+• <code>/jobs</code> - Show indexing jobs
+• <code>/cancel &lt;channel_id&gt;</code> - Cancel an indexing job
 • <code>/delete</code> - Delete media from database (reply to media)
 
 <b>👥 User Management:</b>
 • <code>/ban &lt;user_id&gt;</code> - Ban a user from using the bot
 • <code>/unban &lt;user_id&gt;</code> - Unban a user
 • <code>/broadcast</code> - Send message to all users (reply to message)
+• <code>/broadcast cancel</code> - Stop the running broadcast
 
 <b>🔧 System Management:</b>
 • <code>/logger</code> - View recent log entries
@@ -236,14 +226,7 @@ async def commands_command(client: Client, message: Message):
         logger.error(f"Error in commands command: {e}")
         await message.reply("❌ Error retrieving commands list.")
 
-@Client.on_message(filters.command("help"))
-async def help_command(client: Client, message: Message):
-    """Show help information"""
-    
-    # Check if user is admin to show admin commands
-    is_user_admin = is_admin(message.from_user.id)
-    
-    help_text = """
+HELP_TEXT = """
 ℹ️ <b>Sidee loo isticmaalo Bot-ka Filimada</b>
 
 <b>🔍 Raadinta:</b>
@@ -263,10 +246,8 @@ Qor <code>@{bot_username} magaca filimka</code> chat kasta.
 <b>❓ Caawimaad?</b>
 La xidhiidh maamulka bot-ka.@viizet
 """
-    
-    # Add admin commands if user is admin
-    if is_user_admin:
-        help_text += """
+
+ADMIN_HELP_TEXT = """
 
 <b>👨‍💼 Admin Commands:</b>
 • <code>/stats</code> - View bot statistics
@@ -279,15 +260,19 @@ La xidhiidh maamulka bot-ka.@viizet
 • <code>/logger</code> - View recent logs
 • <code>/delete</code> - Delete media from database
 """
+
+@lru_cache(maxsize=None)
+def render_help(bot_username: str, with_admin_commands: bool) -> str:
+    """Build the help text for the bot username once"""
+    help_text = HELP_TEXT + (ADMIN_HELP_TEXT if with_admin_commands else "")
+    return help_text.replace("{bot_username}", bot_username)
+
+@Client.on_message(filters.command("help"))
+async def help_command(client: Client, message: Message):
+    """Show help information"""
     
-    # Get bot username for examples
-    try:
-        bot_me = await client.get_me()
-        help_text = help_text.replace("{bot_username}", bot_me.username or "BotUsername")
-    except:
-        help_text = help_text.replace("{bot_username}", "BotUsername")
-    
-    await message.reply(help_text)
+    # Admins also get the admin command list
+    await message.reply(render_help(client.username, is_admin(message.from_user.id)))
 
 @Client.on_message(filters.command("delete") & admin_filter)
 async def delete_command(client: Client, message: Message):
@@ -316,12 +301,29 @@ async def delete_command(client: Client, message: Message):
         logger.error(f"Error deleting media: {e}")
         await message.reply("❌ Error deleting media from database.")
 
+def parse_report_window(args):
+    """Parse the optional `days`, `<hours>h` or `live` argument of the analytics reports"""
+    arg = args[1].lower() if len(args) > 1 else ""
+    live = arg == "live"
+    days = int(arg) if arg.isdigit() and int(arg) > 0 else None
+    hours = int(arg[:-1]) if arg.endswith("h") and arg[:-1].isdigit() and int(arg[:-1]) > 0 else None
+    return live, days, hours
+
 @Client.on_message(filters.command("top10") & admin_filter)
 async def top10_command(client: Client, message: Message):
     """Show top 10 most searched movies and most active users"""
+    live, days, hours = parse_report_window(message.text.split())
+    
     try:
-        # Get top searched movies
-        top_movies = await client.db.get_top_searched_movies(10)
+        if live:
+            # In-process sketch of the recent window, no database access
+            top_movies = [
+                {"query": query, "search_count": count}
+                for query, count in client.analytics.live.top(10)
+            ]
+        else:
+            # Get top searched movies, optionally limited to the last N days or hours
+            top_movies = await client.db.get_top_searched_movies(10, days=days, hours=hours)
         
         # Get most active users
         top_users = await client.db.get_most_active_users(10)
@@ -329,7 +331,13 @@ async def top10_command(client: Client, message: Message):
         response = "📊 <b>Top 10 Analytics Report</b>\n\n"
         
         # Top searched movies section
-        response += "🎬 <b>Most Searched Movies:</b>\n"
+        response += "🎬 <b>Most Searched Movies"
+        if live:
+            response += f" (live, last {Config.LIVE_TOP_WINDOW // 60} min):</b>\n"
+        elif hours:
+            response += f" (last {hours} hours):</b>\n"
+        else:
+            response += f" (last {days} days):</b>\n" if days else ":</b>\n"
         if top_movies:
             for i, movie in enumerate(top_movies, 1):
                 query = movie['query']
@@ -370,25 +378,43 @@ async def top10_command(client: Client, message: Message):
 @Client.on_message(filters.command("notfound") & admin_filter)
 async def not_found_command(client: Client, message: Message):
     """Show most searched queries that returned no results"""
+    live, days, hours = parse_report_window(message.text.split())
+    
     try:
-        # Get most searched not found queries
-        not_found_searches = await client.db.get_most_searched_not_found(15)
+        if live:
+            # In-process sketch of the recent window, no database access
+            not_found_searches = [
+                {"query": query, "search_count": count}
+                for query, count in client.analytics.live.top(15, not_found=True)
+            ]
+        else:
+            # Get most searched not found queries, optionally limited to the last N days or hours
+            not_found_searches = await client.db.get_most_searched_not_found(15, days=days, hours=hours)
         
         response = "🔍 <b>Most Searched Not Found Videos</b>\n\n"
+        if live:
+            response = f"🔍 <b>Most Searched Not Found Videos (live, last {Config.LIVE_TOP_WINDOW // 60} min)</b>\n\n"
+        elif hours:
+            response = f"🔍 <b>Most Searched Not Found Videos (last {hours} hours)</b>\n\n"
+        elif days:
+            response = f"🔍 <b>Most Searched Not Found Videos (last {days} days)</b>\n\n"
         response += "📋 <i>Videos users searched for but not available:</i>\n\n"
         
         if not_found_searches:
             for i, search in enumerate(not_found_searches, 1):
                 query = search['query']
                 count = search['search_count']
-                unique_users = search['unique_users']
+                unique_users = search.get('unique_users')
                 
                 # Limit query length for display
                 if len(query) > 35:
                     query = query[:32] + "..."
                 
                 response += f"{i}. <code>{query}</code>\n"
-                response += f"   🔢 {count:,} searches by {unique_users} users\n\n"
+                if unique_users is None:
+                    response += f"   🔢 {count:,} searches\n\n"
+                else:
+                    response += f"   🔢 {count:,} searches by ~{unique_users:,} users\n\n"
         else:
             response += "• No not found search data available yet\n"
         
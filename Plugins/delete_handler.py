@@ -0,0 +1,35 @@
+"""
+Channel Deletion Handler
+"""
+
+import logging
+from collections import defaultdict
+from typing import List
+from pyrogram import Client, filters
+from pyrogram.types import Message
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+@Client.on_deleted_messages(filters.chat(Config.CHANNELS))
+async def handle_deleted_media(client: Client, messages: List[Message]):
+    """Remove media deleted from configured channels"""
+    # The handler fires if any message matches, so filter the rest here
+    message_ids = defaultdict(list)
+    for message in messages:
+        if message.chat and message.chat.id in Config.CHANNELS:
+            message_ids[message.chat.id].append(message.id)
+    
+    if not message_ids:
+        return
+    
+    # Posts deleted right after upload may still be queued for indexing
+    await client.ingest.flush()
+    
+    for chat_id, ids in message_ids.items():
+        try:
+            deleted = await client.db.delete_media_batch(chat_id, ids)
+            if deleted:
+                logger.info(f"Removed {deleted} deleted media from {chat_id}")
+        except Exception as e:
+            logger.error(f"Error handling deleted messages: {e}")
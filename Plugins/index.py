@@ -5,9 +5,8 @@ Media Indexing Handler
 import logging
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from utils import extract_media_info, is_admin
+from utils import extract_media_info, is_admin, forget_inline_result
 from config import Config
-import asyncio
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +15,7 @@ channel_filter = filters.chat(Config.CHANNELS)
 
 @Client.on_message(channel_filter & (filters.video | filters.document | filters.audio | filters.photo | filters.animation))
 async def index_media(client: Client, message: Message):
-    """Index media files from configured channels"""
+    """Queue media files from configured channels for indexing"""
     try:
         # Extract media information
         media_info = extract_media_info(message)
@@ -24,132 +23,141 @@ async def index_media(client: Client, message: Message):
         if not media_info:
             return
         
-        # Save to database
-        success = await client.db.save_media(media_info)
-        
-        if success:
-            logger.info(f"Indexed {media_info['file_type']}: {media_info['file_name']} from {message.chat.title}")
-        else:
+        if media_info["file_unique_id"] in client.db.known_files:
             logger.debug(f"Media already exists: {media_info['file_name']}")
+            return
+        
+        # Saved by the ingest writer in the next batch
+        await client.ingest.put(media_info)
+        logger.debug(f"Queued {media_info['file_type']}: {media_info['file_name']} from {message.chat.title}")
             
     except Exception as e:
         logger.error(f"Error indexing media: {e}")
 
 @Client.on_message(filters.command("index") & filters.user(Config.ADMINS))
 async def manual_index_command(client: Client, message: Message):
-    """Manually index messages from a channel"""
+    """Start background backfills of one channel or of all configured channels"""
     args = message.text.split()
     
     if len(args) < 2:
         await message.reply(
-            "❌ Usage: /index <channel_id> [limit]\n\n"
-            "Example: /index -1001234567890 100\n"
-            "This will index last 100 messages from the channel."
+            "❌ Usage: /index <channel_id|all> [reset]\n\n"
+            "Example: /index -1001234567890\n"
+            "Indexes the channel in the background, resuming from where the last run stopped.\n"
+            "Use <code>all</code> for every configured channel and <code>reset</code> to re-read the whole history."
         )
         return
     
     try:
-        channel_id = int(args[1])
-        limit = int(args[2]) if len(args) > 2 else 100
+        channel_ids = Config.CHANNELS if args[1].lower() == "all" else [int(args[1])]
+    except ValueError:
+        await message.reply("❌ Invalid channel ID. Please provide a valid number.")
+        return
+    
+    reset = len(args) > 2 and args[2].lower() == "reset"
+    
+    for channel_id in channel_ids:
+        try:
+            # Get chat info
+            chat = await client.get_chat(channel_id)
+            chat_title = chat.title or "Unknown Chat"
+        except Exception as e:
+            await message.reply(f"❌ Error accessing channel <code>{channel_id}</code>: {e}")
+            continue
         
-        if limit > 1000:
-            await message.reply("❌ Limit cannot exceed 1000 messages.")
-            return
+        if client.backfill.is_running(channel_id):
+            await message.reply(f"⏳ <b>{chat_title}</b> is already being indexed. Use /jobs to follow it.")
+            continue
+        
+        if reset:
+            await client.db.reset_index_checkpoint(channel_id)
         
         status_msg = await message.reply(
-            f"🔄 <b>Starting manual indexing...</b>\n\n"
+            f"🔄 <b>Queued indexing: {chat_title}</b>\n\n"
             f"📊 Channel ID: <code>{channel_id}</code>\n"
-            f"📊 Limit: {limit} messages\n"
-            f"⏳ Please wait..."
+            f"⏳ Runs in the background; /cancel {channel_id} stops it."
         )
-        
-        indexed_count = 0
-        skipped_count = 0
-        error_count = 0
-        
+        client.backfill.submit(channel_id, chat_title, status_msg)
+
+@Client.on_message(filters.command("resolve") & filters.user(Config.ADMINS))
+async def resolve_command(client: Client, message: Message):
+    """Fetch file ids for media imported from Telegram Desktop exports"""
+    args = message.text.split()
+    
+    try:
+        channel_ids = [int(args[1])] if len(args) > 1 else Config.CHANNELS
+    except ValueError:
+        await message.reply("❌ Invalid channel ID. Please provide a valid number.")
+        return
+    
+    for channel_id in channel_ids:
         try:
-            # Get chat info
             chat = await client.get_chat(channel_id)
             chat_title = chat.title or "Unknown Chat"
-            
-            await status_msg.edit_text(
-                f"🔄 <b>Indexing: {chat_title}</b>\n\n"
-                f"📊 Processing {limit} messages...\n"
-                f"⏳ Starting..."
-            )
-            
         except Exception as e:
-            await status_msg.edit_text(f"❌ Error accessing channel: {e}")
-            return
+            await message.reply(f"❌ Error accessing channel <code>{channel_id}</code>: {e}")
+            continue
         
-        # Process messages
-        async for msg in client.get_chat_history(channel_id, limit=limit):
-            try:
-                # Check if message has media
-                if not (msg.video or msg.document or msg.audio or msg.photo or msg.animation):
-                    skipped_count += 1
-                    continue
-                
-                # Extract media info
-                media_info = extract_media_info(msg)
-                if not media_info:
-                    skipped_count += 1
-                    continue
-                
-                # Save to database
-                success = await client.db.save_media(media_info)
-                
-                if success:
-                    indexed_count += 1
-                    logger.info(f"Manually indexed: {media_info['file_name']}")
-                else:
-                    skipped_count += 1
-                
-                # Update status every 10 files
-                if (indexed_count + skipped_count + error_count) % 10 == 0:
-                    await status_msg.edit_text(
-                        f"🔄 <b>Indexing: {chat_title}</b>\n\n"
-                        f"✅ Indexed: {indexed_count}\n"
-                        f"⏭ Skipped: {skipped_count}\n"
-                        f"❌ Errors: {error_count}\n"
-                        f"📊 Progress: {indexed_count + skipped_count + error_count}/{limit}"
-                    )
-                
-                # Small delay to prevent rate limits
-                await asyncio.sleep(0.1)
-                
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Error processing message {msg.id}: {e}")
+        if client.backfill.is_running(channel_id):
+            await message.reply(f"⏳ <b>{chat_title}</b> already has a running job. Use /jobs to follow it.")
+            continue
         
-        # Final status
-        await status_msg.edit_text(
-            f"✅ <b>Indexing Complete!</b>\n\n"
-            f"📊 <b>Results for {chat_title}:</b>\n"
-            f"✅ Successfully indexed: {indexed_count}\n"
-            f"⏭ Skipped (no media/duplicate): {skipped_count}\n"
-            f"❌ Errors: {error_count}\n"
-            f"📊 Total processed: {indexed_count + skipped_count + error_count}/{limit}"
+        status_msg = await message.reply(f"🔄 <b>Queued resolving: {chat_title}</b>")
+        client.backfill.submit_resolve(channel_id, chat_title, status_msg)
+
+@Client.on_message(filters.command("jobs") & filters.user(Config.ADMINS))
+async def jobs_command(client: Client, message: Message):
+    """Show background backfills"""
+    jobs = client.backfill.list_jobs()
+    
+    if not jobs:
+        await message.reply("📭 No indexing jobs since the bot started.")
+        return
+    
+    text = "🗂 <b>Indexing Jobs</b>\n\n"
+    for job in jobs:
+        text += (
+            f"<b>{job.chat_title}</b> (<code>{job.chat_id}</code>) - {job.kind} {job.state}\n"
+            f"✅ {job.indexed:,} indexed • ⏭ {job.skipped:,} skipped • ❌ {job.errors:,} errors\n\n"
         )
-        
+    
+    await message.reply(text)
+
+@Client.on_message(filters.command("cancel") & filters.user(Config.ADMINS))
+async def cancel_command(client: Client, message: Message):
+    """Cancel a background backfill or resolve job"""
+    args = message.text.split()
+    
+    if len(args) < 2:
+        await message.reply("❌ Usage: /cancel <channel_id>")
+        return
+    
+    try:
+        channel_id = int(args[1])
     except ValueError:
         await message.reply("❌ Invalid channel ID. Please provide a valid number.")
-    except Exception as e:
-        logger.error(f"Error in manual index command: {e}")
-        await message.reply(f"❌ Error during indexing: {e}")
+        return
+    
+    if client.backfill.cancel(channel_id):
+        await message.reply(f"🛑 Cancelling the job for <code>{channel_id}</code>. Run the command again to resume it.")
+    else:
+        await message.reply(f"❌ No running job for <code>{channel_id}</code>.")
 
 @Client.on_edited_message(channel_filter & (filters.video | filters.document | filters.audio | filters.photo | filters.animation))
 async def handle_edited_media(client: Client, message: Message):
     """Handle edited media messages"""
     try:
-        # For edited messages, we can update the existing record
-        # First delete the old record, then add the new one
-        await client.db.delete_media(message.chat.id, message.id)
+        media_info = extract_media_info(message)
+        if not media_info:
+            return
         
-        # Index the updated message
-        await index_media(client, message)
+        # The original may still be queued; write it first so the edit replaces it
+        await client.ingest.flush()
         
-        logger.info(f"Updated indexed media: {message.id} from {message.chat.title}")
+        # Replace the existing record in place, so it never drops out of search
+        if await client.db.upsert_media(media_info):
+            forget_inline_result(media_info["file_unique_id"])
+            logger.info(f"Updated indexed media: {message.id} from {message.chat.title}")
         
     except Exception as e:
         logger.error(f"Error handling edited media: {e}")
@@ -2,6 +2,7 @@
 Inline Query Handler for Search Functionality
 """
 
+import asyncio
 import logging
 from pyrogram import Client, filters
 from pyrogram.types import (
@@ -9,21 +10,85 @@ from pyrogram.types import (
     InlineQueryResultAudio, InlineQueryResultPhoto, InlineQueryResultAnimation,
     InlineQueryResultCachedVideo, InlineQueryResultCachedDocument, 
     InlineQueryResultCachedAudio, InlineQueryResultCachedPhoto, InlineQueryResultCachedAnimation,
-    InputTextMessageContent
+    InputTextMessageContent, InlineKeyboardMarkup, InlineKeyboardButton
 )
-from utils import is_subscribed, is_authorized_user, format_file_size, get_file_type_emoji, escape_html
+from utils import (
+    check_access, ACCESS_UNSUBSCRIBED, ACCESS_UNAUTHORIZED,
+    format_file_size, get_file_type_emoji, escape_html,
+    encode_search_cursor, decode_search_cursor, result_cache
+)
+from database import SEARCH_PAGE_SIZE
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Shared by every video result; results only read it when the answer is serialized
+VIDEO_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔍 Search", switch_inline_query_current_chat=""),
+        InlineKeyboardButton("📢 Join", url="https://t.me/daawotv")
+    ]
+])
+
+# Latest in-flight inline query per user; older ones are cancelled as the user keeps typing
+pending_queries = {}
+
 @Client.on_inline_query()
 async def inline_query_handler(client: Client, query: InlineQuery):
-    """Handle inline queries for media search"""
+    """Handle inline queries, dropping work for queries the user has already typed past"""
     user_id = query.from_user.id
+    
+    task = asyncio.ensure_future(answer_inline_query(client, query))
+    superseded = pending_queries.get(user_id)
+    pending_queries[user_id] = task
+    if superseded and not superseded.done():
+        superseded.cancel()
+    
+    try:
+        await task
+    except asyncio.CancelledError:
+        # A newer query from the same user replaced this one; anything else is a real cancellation
+        if pending_queries.get(user_id) is task:
+            raise
+        logger.debug(f"Skipped superseded inline query from {user_id}: '{query.query}'")
+    finally:
+        if pending_queries.get(user_id) is task:
+            del pending_queries[user_id]
+
+async def answer_inline_query(client: Client, query: InlineQuery):
+    """Search media and answer a single inline query"""
     search_query = query.query.strip()
     
+    # Parse query for file type filter
+    file_type_filter = None
+    if " | " in search_query:
+        search_query, file_type_filter = search_query.split(" | ", 1)
+        file_type_filter = file_type_filter.strip().lower()
+        search_query = search_query.strip()
+    
+    # The offset carries the keyset cursor of the previous page
+    cursor = decode_search_cursor(query.offset)
+    
+    # Start the search speculatively so it overlaps the access checks
+    if search_query:
+        logger.info(f"Searching for: '{search_query}' with filter: {file_type_filter}")
+        search = asyncio.ensure_future(client.db.search_media(search_query, file_type_filter, cursor))
+    else:
+        search = asyncio.ensure_future(client.db.get_recent_videos(limit=10))
+    
+    try:
+        await respond_to_inline_query(client, query, search_query, search)
+    finally:
+        # No-op once awaited; drops the search when access is denied or the query is superseded
+        search.cancel()
+
+async def respond_to_inline_query(client: Client, query: InlineQuery, search_query: str, search: asyncio.Future):
+    """Check access and answer an inline query with the results of its search"""
+    user_id = query.from_user.id
+    access = await check_access(client, user_id)
+    
     # Check subscription
-    if not await is_subscribed(client, user_id):
+    if access == ACCESS_UNSUBSCRIBED:
         results = [
             InlineQueryResultDocument(
                 id="auth_required",
@@ -33,7 +98,7 @@ async def inline_query_handler(client: Client, query: InlineQuery):
                 mime_type="text/plain",
                 input_message_content=InputTextMessageContent(
                     "🔒 You need to join our channel to use this bot.\n"
-                    f"Start the bot @{(await client.get_me()).username} for more information."
+                    f"Start the bot @{client.username} for more information."
                 )
             )
         ]
@@ -46,7 +111,7 @@ async def inline_query_handler(client: Client, query: InlineQuery):
         return
     
     # Check authorization
-    if not await is_authorized_user(user_id, client):
+    if access == ACCESS_UNAUTHORIZED:
         results = [
             InlineQueryResultArticle(
                 id="unauthorized",
@@ -70,18 +135,9 @@ async def inline_query_handler(client: Client, query: InlineQuery):
     if not search_query:
         try:
             # Get recent videos specifically (limit to 10 for immediate display)
-            recent_videos = await client.db.get_recent_videos(limit=10)
+            recent_videos = await search
             
-            results = []
-            if recent_videos:
-                for idx, media in enumerate(recent_videos):
-                    try:
-                        result = create_inline_result(media, idx)
-                        if result:
-                            results.append(result)
-                    except Exception as e:
-                        logger.error(f"Error creating inline result: {e}")
-                        continue
+            results = render_inline_results(recent_videos)
             
             # If no video results, show a helpful message
             if not results:
@@ -131,21 +187,15 @@ async def inline_query_handler(client: Client, query: InlineQuery):
             )
             return
     
-    # Parse query for file type filter
-    file_type_filter = None
-    if " | " in search_query:
-        search_query, file_type_filter = search_query.split(" | ", 1)
-        file_type_filter = file_type_filter.strip().lower()
-        search_query = search_query.strip()
-    
     try:
         # Search database
-        logger.info(f"Searching for: '{search_query}' with filter: {file_type_filter}")
-        media_results = await client.db.search_media(search_query, file_type_filter)
+        media_results = await search
         logger.info(f"Found {len(media_results)} results")
         
-        if not media_results:
-            from pyrogram.types import InlineQueryResultArticle
+        if not media_results and query.offset:
+            # Scrolled past the last page
+            results = []
+        elif not media_results:
             results = [
                 InlineQueryResultArticle(
                     id="no_results",
@@ -162,30 +212,26 @@ async def inline_query_handler(client: Client, query: InlineQuery):
                 )
             ]
         else:
-            results = []
-            
-            for idx, media in enumerate(media_results):
-                try:
-                    result = create_inline_result(media, idx)
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    logger.error(f"Error creating inline result: {e}")
-                    continue
+            results = render_inline_results(media_results)
         
         # Answer inline query
         await query.answer(
             results=results[:50],  # Telegram limit
             cache_time=Config.CACHE_TIME,
             is_personal=True,
-            next_offset=str(len(results)) if len(media_results) >= Config.MAX_RESULTS else ""
+            next_offset=encode_search_cursor(media_results[-1]) if len(media_results) >= SEARCH_PAGE_SIZE else ""
         )
         
+        # Log the first page only; queries the user typed past were cancelled before this point
+        if not query.offset:
+            client.analytics.record(
+                user_id, search_query, found=bool(media_results), username=query.from_user.username
+            )
+        
     except Exception as e:
         logger.error(f"Error handling inline query: {e}")
         
         # Error result
-        from pyrogram.types import InlineQueryResultArticle
         results = [
             InlineQueryResultArticle(
                 id="error",
@@ -205,7 +251,23 @@ async def inline_query_handler(client: Client, query: InlineQuery):
             is_personal=True
         )
 
-def create_inline_result(media: dict, index: int):
+def render_inline_results(media_results: list) -> list:
+    """Inline results for media documents, reusing the ones rendered for earlier queries"""
+    results = []
+    for media in media_results:
+        key = media.get("file_unique_id")
+        result = result_cache.get(key) if key else None
+        
+        if result is None:
+            result = create_inline_result(media)
+            if result and key:
+                result_cache.set(key, result)
+        
+        if result:
+            results.append(result)
+    return results
+
+def create_inline_result(media: dict):
     """Create inline result based on media type"""
     file_type = media.get("file_type")
     file_name = media.get("file_name", "Unknown")
@@ -213,6 +275,9 @@ def create_inline_result(media: dict, index: int):
     caption = media.get("caption", "")
     file_id = media.get("file_id")
     
+    # Result ids must be unique within an answer; the file id keeps them stable across queries
+    result_id = media.get("file_unique_id") or str(media.get("_id"))
+    
     # Truncate long filenames for display
     display_name = file_name if len(file_name) <= 50 else file_name[:47] + "..."
     
@@ -230,64 +295,49 @@ def create_inline_result(media: dict, index: int):
     
     try:
         if file_type == "video":
-            from pyrogram.types import InlineQueryResultCachedVideo, InlineKeyboardMarkup, InlineKeyboardButton
-            
-            # Create custom keyboard with Search and Join buttons
-            keyboard = InlineKeyboardMarkup([
-                [
-                    InlineKeyboardButton("🔍 Search", switch_inline_query_current_chat=""),
-                    InlineKeyboardButton("📢 Join", url="https://t.me/daawotv")
-                ]
-            ])
-            
             return InlineQueryResultCachedVideo(
-                id=f"video_{index}",
+                id=result_id,
                 video_file_id=file_id,
                 title=title,
                 description=description,
                 caption=f"{file_name}\n\nKUSO BIIT @DAAWOTV",
-                reply_markup=keyboard
+                reply_markup=VIDEO_KEYBOARD
             )
             
         elif file_type == "document":
-            from pyrogram.types import InlineQueryResultCachedDocument
             return InlineQueryResultCachedDocument(
-                id=f"doc_{index}",
+                id=result_id,
                 title=title,
                 description=description,
                 document_file_id=file_id
             )
             
         elif file_type == "audio":
-            from pyrogram.types import InlineQueryResultCachedAudio
             return InlineQueryResultCachedAudio(
-                id=f"audio_{index}",
+                id=result_id,
                 audio_file_id=file_id,
                 title=title
             )
             
         elif file_type == "photo":
-            from pyrogram.types import InlineQueryResultCachedPhoto
             return InlineQueryResultCachedPhoto(
-                id=f"photo_{index}",
+                id=result_id,
                 photo_file_id=file_id,
                 title=title,
                 description=description
             )
             
         elif file_type == "gif":
-            from pyrogram.types import InlineQueryResultCachedAnimation
             return InlineQueryResultCachedAnimation(
-                id=f"gif_{index}",
+                id=result_id,
                 animation_file_id=file_id,
                 title=title
             )
             
         else:
             # Fallback to document
-            from pyrogram.types import InlineQueryResultCachedDocument
             return InlineQueryResultCachedDocument(
-                id=f"file_{index}",
+                id=result_id,
                 title=title,
                 description=description,
                 document_file_id=file_id
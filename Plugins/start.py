@@ -3,14 +3,66 @@ Start Command Handler
 """
 
 import logging
+from functools import lru_cache
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from utils import is_subscribed, is_authorized_user
+from utils import is_subscribed, is_authorized_user, forget_membership
 from config import Config
 
 logger = logging.getLogger(__name__)
 
-logger = logging.getLogger(__name__)
+WELCOME_TEXT = """
+🎬 <b>Soo dhawoow Bot-ka Filimada!</b>
+
+Salaan {first_name}! Waxaan ku caawinayaa raadinta filimada.
+
+<b>Sidee loo isticmaalo:</b>
+• Qor <code>@{bot_username} magaca filimka</code> chat kasta
+• Filimka rabtay ayaan ku siinayaa
+• Riix natijada aad rabto
+
+<b>Tusaale:</b>
+• <code>@{bot_username} action movies</code>
+• <code>@{bot_username} comedy films</code>
+
+Bilow qorista <code>@{bot_username}</code> si aad u raadiso filimada!
+"""
+
+HELP_TEXT = """
+ℹ️ <b>Sidee loo isticmaalo Bot-ka Filimada</b>
+
+<b>🔍 Raadinta:</b>
+Qor <code>@{bot_username} magaca filimka</code> chat kasta.
+
+<b>🎯 Tusaalooyin:</b>
+• <code>@{bot_username} action movies</code>
+• <code>@{bot_username} comedy films</code>
+• <code>@{bot_username} horror movies</code>
+• <code>@{bot_username} "specific movie name"</code>
+
+<b>📝 Tilmaamo:</b>
+• Isticmaal erayo gaar ah
+• Qor magaca filimka si sax ah
+• Isticmaal <code>" "</code> magaca dhabta ah
+
+<b>❓ Caawimaad?</b>
+La xidhiidh maamulka bot-ka.
+"""
+
+START_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎬 Search Movies", switch_inline_query_current_chat="")],
+    [InlineKeyboardButton("ℹ️ Help", callback_data="help")]
+])
+
+@lru_cache(maxsize=None)
+def render_welcome(bot_username: str) -> str:
+    """Build the welcome template for the bot username once, leaving {first_name}"""
+    return WELCOME_TEXT.replace("{bot_username}", bot_username)
+
+@lru_cache(maxsize=None)
+def render_help(bot_username: str) -> str:
+    """Build the help text for the bot username once"""
+    return HELP_TEXT.replace("{bot_username}", bot_username)
 
 @Client.on_message(filters.command("start") & filters.private)
 async def start_command(client: Client, message: Message):
@@ -49,70 +101,36 @@ async def start_command(client: Client, message: Message):
         return
     
     # Welcome message
-    bot_username = (await client.get_me()).username
+    welcome_text = render_welcome(client.username).replace("{first_name}", user.first_name or "")
     
-    welcome_text = f"""
-🎬 <b>Soo dhawoow Bot-ka Filimada!</b>
-
-Salaan {user.first_name}! Waxaan ku caawinayaa raadinta filimada.
-
-<b>Sidee loo isticmaalo:</b>
-• Qor <code>@{bot_username} magaca filimka</code> chat kasta
-• Filimka rabtay ayaan ku siinayaa
-• Riix natijada aad rabto
-
-<b>Tusaale:</b>
-• <code>@{bot_username} action movies</code>
-• <code>@{bot_username} comedy films</code>
-
-Bilow qorista <code>@{bot_username}</code> si aad u raadiso filimada!
-"""
-
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton("🎬 Search Movies", switch_inline_query_current_chat="")],
-        [InlineKeyboardButton("ℹ️ Help", callback_data="help")]
-    ])
-    
-    await message.reply(welcome_text, reply_markup=keyboard)
+    await message.reply(welcome_text, reply_markup=START_KEYBOARD)
 
 @Client.on_callback_query(filters.regex("check_sub"))
 async def check_subscription(client: Client, callback_query):
     """Check user subscription status"""
     user_id = callback_query.from_user.id
     
-    if await is_subscribed(client, user_id):
+    if await is_subscribed(client, user_id, force=True):
         await callback_query.answer("✅ Subscription verified! You can now use the bot.", show_alert=True)
         # Send start message
         await start_command(client, callback_query.message)
     else:
         await callback_query.answer("❌ Please join the channel first!", show_alert=True)
 
+@Client.on_chat_member_updated(filters.chat(Config.AUTH_CHANNEL))
+async def auth_channel_member_updated(client: Client, update):
+    """Invalidate cached membership when someone joins or leaves the auth channel"""
+    member = update.new_chat_member or update.old_chat_member
+    if member and member.user:
+        forget_membership(member.user.id)
+
 @Client.on_callback_query(filters.regex("help"))
 async def handle_callbacks(client: Client, callback_query):
     """Handle callback queries"""
     data = callback_query.data
     
     if data == "help":
-        help_text = """
-ℹ️ <b>Sidee loo isticmaalo Bot-ka Filimada</b>
-
-<b>🔍 Raadinta:</b>
-Qor <code>@botusername magaca filimka</code> chat kasta.
-
-<b>🎯 Tusaalooyin:</b>
-• <code>@botusername action movies</code>
-• <code>@botusername comedy films</code>
-• <code>@botusername horror movies</code>
-• <code>@botusername "specific movie name"</code>
-
-<b>📝 Tilmaamo:</b>
-• Isticmaal erayo gaar ah
-• Qor magaca filimka si sax ah
-• Isticmaal <code>" "</code> magaca dhabta ah
-
-<b>❓ Caawimaad?</b>
-La xidhiidh maamulka bot-ka.
-"""
+        help_text = render_help(client.username)
         await callback_query.edit_message_text(help_text)
 
 def format_file_size(size_bytes: int) -> str:
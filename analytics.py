@@ -0,0 +1,298 @@
+"""
+Search Analytics Pipeline
+"""
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from config import Config
+from utils import BatchWriter, escape_html
+
+logger = logging.getLogger(__name__)
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2^PRECISION registers (~3% standard error).
+    
+    Registers are kept sparse as {index: rank}, the same shape stored in MongoDB
+    under "hll", so sketches merge with a per-register max both in Python and
+    through $max updates.
+    """
+    
+    PRECISION = 10
+    REGISTERS = 1 << PRECISION
+    
+    def __init__(self):
+        self.registers: Dict[int, int] = {}
+    
+    @classmethod
+    def register_for(cls, value: Any) -> Tuple[int, int]:
+        """Hash a value to its (register index, rank)"""
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (64 - cls.PRECISION)
+        remainder = hashed & ((1 << (64 - cls.PRECISION)) - 1)
+        return index, (64 - cls.PRECISION) - remainder.bit_length() + 1
+    
+    @classmethod
+    def from_registers(cls, registers: Dict[Any, int]) -> "HyperLogLog":
+        sketch = cls()
+        sketch.merge_registers(registers)
+        return sketch
+    
+    def add(self, value: Any):
+        index, rank = self.register_for(value)
+        if rank > self.registers.get(index, 0):
+            self.registers[index] = rank
+    
+    def merge_registers(self, registers: Dict[Any, int]):
+        """Merge another sketch's registers (keys may be strings, as stored in MongoDB)"""
+        for index, rank in registers.items():
+            index = int(index)
+            if rank > self.registers.get(index, 0):
+                self.registers[index] = rank
+    
+    def count(self) -> int:
+        """Estimate the number of distinct values added"""
+        m = self.REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        zeros = m - len(self.registers)
+        harmonic = zeros + sum(2.0 ** -rank for rank in self.registers.values())
+        estimate = alpha * m * m / harmonic
+        
+        # Small-range correction: linear counting while registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch: approximate top-k counts in fixed memory.
+    
+    Keeps at most `capacity` counters. An unseen item takes over the smallest
+    counter, inheriting its count as the error bound, so any item more frequent
+    than total / capacity is guaranteed to be tracked.
+    
+    The smallest counter is found through a min-heap with one entry per item.
+    Increments leave heap entries stale (too low) and eviction refreshes them
+    as they surface, so offer() is O(log capacity) amortized.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+    
+    def offer(self, item: str, count: int = 1):
+        """Count an occurrence of item"""
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (count, item))
+        else:
+            floor, victim = self._heap[0]
+            while self.counts[victim] != floor:
+                heapq.heapreplace(self._heap, (self.counts[victim], victim))
+                floor, victim = self._heap[0]
+            
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+            heapq.heapreplace(self._heap, (floor + count, item))
+    
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """Get the k largest (item, count) pairs"""
+        return heapq.nlargest(k, self.counts.items(), key=lambda pair: pair[1])
+    
+    def to_list(self) -> List[List[Any]]:
+        # Queries can contain "." or "$", so they are stored as values, not field names
+        return [[item, count, self.errors[item]] for item, count in self.counts.items()]
+    
+    @classmethod
+    def from_list(cls, capacity: int, entries: List[List[Any]]) -> "SpaceSaving":
+        sketch = cls(capacity)
+        for item, count, error in entries[:capacity]:
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+        sketch._heap = [(count, item) for item, count in sketch.counts.items()]
+        heapq.heapify(sketch._heap)
+        return sketch
+
+class LiveTopQueries:
+    """Top searched and top not-found queries over a sliding time window.
+    
+    The window is split into buckets, each holding a pair of Space-Saving
+    sketches; expired buckets are dropped and the rest are summed on read.
+    """
+    
+    BUCKETS = 6
+    
+    def __init__(self, window: int, capacity: int):
+        self.window = window
+        self.capacity = capacity
+        self.bucket_span = window / self.BUCKETS
+        # (bucket start timestamp, searched sketch, not-found sketch), oldest first
+        self.buckets: List[Tuple[float, SpaceSaving, SpaceSaving]] = []
+    
+    def _current_bucket(self, now: float) -> Tuple[float, SpaceSaving, SpaceSaving]:
+        self._expire(now)
+        if not self.buckets or now - self.buckets[-1][0] >= self.bucket_span:
+            self.buckets.append((now, SpaceSaving(self.capacity), SpaceSaving(self.capacity)))
+        return self.buckets[-1]
+    
+    def _expire(self, now: float):
+        while self.buckets and now - self.buckets[0][0] >= self.window:
+            self.buckets.pop(0)
+    
+    def offer(self, query: str, found: bool):
+        """Count a search"""
+        _, searched, not_found = self._current_bucket(time.time())
+        searched.offer(query)
+        if not found:
+            not_found.offer(query)
+    
+    def top(self, k: int, not_found: bool = False) -> List[Tuple[str, int]]:
+        """Get the k most frequent queries in the window"""
+        self._expire(time.time())
+        totals: Dict[str, int] = {}
+        for _, searched, missing in self.buckets:
+            for query, count in (missing if not_found else searched).counts.items():
+                totals[query] = totals.get(query, 0) + count
+        return heapq.nlargest(k, totals.items(), key=lambda pair: pair[1])
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "buckets": [
+                {"start": start, "searched": searched.to_list(), "not_found": missing.to_list()}
+                for start, searched, missing in self.buckets
+            ]
+        }
+    
+    def load(self, data: Dict[str, Any]):
+        """Restore buckets from a snapshot, skipping the ones that already expired"""
+        self.buckets = [
+            (
+                bucket["start"],
+                SpaceSaving.from_list(self.capacity, bucket["searched"]),
+                SpaceSaving.from_list(self.capacity, bucket["not_found"])
+            )
+            for bucket in data.get("buckets", [])
+        ]
+        self._expire(time.time())
+
+class SearchAnalytics(BatchWriter):
+    """Write-behind queue for search logs, flushed to MongoDB in batches.
+    
+    The inline handler only enqueues. When the queue is full, new events are
+    dropped rather than slowing down inline answers.
+    """
+    
+    def __init__(self, db):
+        super().__init__(Config.ANALYTICS_QUEUE_SIZE, Config.ANALYTICS_BATCH_SIZE, Config.ANALYTICS_FLUSH_INTERVAL)
+        self.db = db
+        self.dropped = 0
+        self.flushed = 0
+        
+        # In-process heavy hitters, snapshotted to MongoDB so they survive restarts
+        self.live = LiveTopQueries(Config.LIVE_TOP_WINDOW, Config.LIVE_TOP_CAPACITY)
+    
+    async def load_snapshot(self):
+        """Restore the live top queries saved by the last snapshot"""
+        snapshot = await self.db.load_analytics_snapshot("live_top_queries")
+        if snapshot and snapshot.get("window") == self.live.window:
+            self.live.load(snapshot)
+    
+    async def save_snapshot(self):
+        """Persist the live top queries"""
+        await self.db.save_analytics_snapshot("live_top_queries", self.live.to_dict())
+    
+    async def stop(self):
+        """Stop the writer, flush everything still queued and snapshot the live top queries"""
+        await super().stop()
+        await self.save_snapshot()
+    
+    def record(self, user_id: int, query: str, found: bool, username: str = None):
+        """Enqueue a search event without waiting"""
+        normalized = query.strip().lower()
+        if normalized:
+            self.live.offer(normalized, found)
+        
+        try:
+            self.queue.put_nowait({
+                "user_id": user_id,
+                "username": username,
+                "query": query,
+                "found": found,
+                "timestamp": datetime.now()
+            })
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    async def write(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Search logs are best effort: a failed batch is not retried
+        if await self.db.log_search_batch(batch):
+            self.flushed += len(batch)
+        logger.debug(f"Flushed {len(batch)} search events")
+        return []
+
+class NotFoundPercolator:
+    """Match newly indexed media against pending not-found queries.
+    
+    Indexing only queues the new documents; a periodic pass resolves the
+    queries they answer, BATCH_SIZE documents at a time, and reports them to
+    the admins in one message.
+    """
+    
+    BATCH_SIZE = 500
+    REPORT_LIMIT = 20
+    
+    def __init__(self, client):
+        self.client = client
+        self.pending = deque()
+        self.resolved = 0
+    
+    def submit(self, media: Dict[str, Any]):
+        """Queue newly indexed media for matching"""
+        self.pending.append({
+            "file_name": media.get("file_name"),
+            "caption": media.get("caption"),
+            "search_tokens": media.get("search_tokens")
+        })
+    
+    async def run(self):
+        """Resolve the queries answered by media queued since the last pass and notify admins"""
+        if not self.pending:
+            return
+        
+        matches = []
+        while self.pending:
+            media = [self.pending.popleft() for _ in range(min(self.BATCH_SIZE, len(self.pending)))]
+            matches.extend(await self.client.db.resolve_not_found_queries(media))
+        if not matches:
+            return
+        self.resolved += len(matches)
+        
+        matches.sort(key=lambda match: match["search_count"], reverse=True)
+        report = f"✅ <b>{len(matches)} Not Found Searches Now Available</b>\n\n"
+        for match in matches[:self.REPORT_LIMIT]:
+            report += (
+                f"• <code>{escape_html(match['query'])}</code> ({match['search_count']:,} searches)\n"
+                f"   ↳ {escape_html(match['file_name'] or 'Unknown')}\n"
+            )
+        if len(matches) > self.REPORT_LIMIT:
+            report += f"\n<i>...and {len(matches) - self.REPORT_LIMIT} more</i>"
+        
+        for admin_id in Config.ADMINS:
+            try:
+                await self.client.send_message(admin_id, report)
+            except Exception as e:
+                logger.error(f"Failed to send not-found report to {admin_id}: {e}")
@@ -7,11 +7,16 @@ This file contains the main MediaSearchBot class which handles:
 - Start & Stop lifecycle methods
 """
 
+import asyncio
 import logging
 from pyrogram import Client
 from pyrogram.enums import ParseMode
 from config import Config
 from database import Database
+from analytics import SearchAnalytics, NotFoundPercolator
+from jobs import BackfillManager, IngestBuffer
+from broadcast import BroadcastManager
+from utils import run_periodically
 
 logger = logging.getLogger(__name__)
 
@@ -29,12 +34,37 @@ class MediaSearchBot(Client):
 
         # Initialize database
         self.db = Database()
+        
+        # Search logging, written behind the inline handler in batches
+        self.analytics = SearchAnalytics(self.db)
+        
+        # Resolves not-found queries as matching media gets indexed
+        self.percolator = NotFoundPercolator(self)
+        
+        # Live channel posts, saved behind the update handlers in batches
+        self.ingest = IngestBuffer(self)
+        
+        # Channel backfills started by /index, resumed from their checkpoints
+        self.backfill = BackfillManager(self)
+        
+        # /broadcast deliveries, resumed from their last checkpoint
+        self.broadcasts = BroadcastManager(self)
+        
+        # Bot identity, resolved once at startup and reused by every plugin
+        self.username = "BotUsername"
+        
+        # Long-running maintenance tasks, cancelled on stop
+        self.background_tasks = []
 
     async def start(self):
         """Start the bot and initialize database"""
         try:
             await super().start()
             logger.info("✅ Bot client started successfully!")
+            
+            # Client.start already resolved self.me; expose the username before any update is handled
+            self.username = self.me.username or self.username
+            logger.info(f"🤖 Logged in as {self.me.first_name} (@{self.me.username})")
 
             # Connect to database
             try:
@@ -44,9 +74,47 @@ class MediaSearchBot(Client):
                 logger.error(f"❌ Database connection failed: {e}")
                 raise
 
-            # Log bot info
-            me = await self.get_me()
-            logger.info(f"🤖 Logged in as {me.first_name} (@{me.username})")
+            await self.analytics.load_snapshot()
+            self.analytics.start()
+            self.ingest.start()
+            self.background_tasks.append(asyncio.create_task(run_periodically(
+                Config.LIVE_SNAPSHOT_INTERVAL, self.analytics.save_snapshot, "live top queries snapshot"
+            )))
+
+            # Index the known file ids so duplicate posts skip MongoDB
+            self.background_tasks.append(asyncio.create_task(self.db.load_known_files()))
+            
+            # Tokenize media indexed before token search, without delaying startup
+            self.background_tasks.append(asyncio.create_task(self.db.backfill_search_tokens()))
+            
+            # Roll raw search logs into hourly rollups, pruning expired ones once compacted
+            self.background_tasks.append(asyncio.create_task(run_periodically(
+                Config.LOG_COMPACTION_INTERVAL, self.db.compact_search_logs, "search log compaction"
+            )))
+            
+            # Match newly indexed media against outstanding not-found queries
+            self.background_tasks.append(asyncio.create_task(run_periodically(
+                Config.PERCOLATE_INTERVAL, self.percolator.run, "not-found percolator"
+            )))
+            
+            # Correct drift in the materialized /stats counters
+            self.background_tasks.append(asyncio.create_task(run_periodically(
+                Config.COUNTER_RECONCILE_INTERVAL, self.db.reconcile_catalogue_counters, "catalogue counter reconcile"
+            )))
+            
+            # Forget files deleted through other instances
+            self.background_tasks.append(asyncio.create_task(run_periodically(
+                Config.KNOWN_FILES_REFRESH_INTERVAL, self.db.load_known_files, "known file refresh"
+            )))
+            
+            # Converge ban lists changed by other instances
+            self.background_tasks.append(asyncio.create_task(run_periodically(
+                Config.BAN_REFRESH_INTERVAL, self.db.load_banned_users, "ban list refresh"
+            )))
+            
+            # Pick up backfills interrupted by the last shutdown
+            await self.backfill.resume_pending()
+            await self.broadcasts.resume_pending()
             logger.info("🚀 Bot is now running!")
             
         except Exception as e:
@@ -55,6 +123,19 @@ class MediaSearchBot(Client):
 
     async def stop(self, *args):
         """Stop the bot cleanly"""
+        for task in self.background_tasks:
+            task.cancel()
+        
+        # Stop backfills at their last checkpoint so they resume on next start
+        await self.backfill.stop()
+        await self.broadcasts.stop()
+        
+        # Save queued channel posts
+        await self.ingest.stop()
+        
+        # Flush queued search logs while the database is still open
+        await self.analytics.stop()
+        
         await super().stop()
         self.db.close()
         logger.info("🛑 Bot stopped. Goodbye!")
@@ -0,0 +1,211 @@
+"""
+Broadcast Engine
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked
+from pyrogram.types import Message
+from config import Config
+from utils import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+# Users sent to between two progress checkpoints
+BROADCAST_CHUNK_SIZE = 200
+
+class TokenBucket:
+    """Rate limiter shared by all senders; a FloodWait pauses every one of them"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the given time"""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self._tokens = 0
+        # Refill from the end of the pause, not across it, so sending resumes at the steady rate
+        self._updated = self._paused_until
+
+    async def acquire(self):
+        """Wait for a token"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class BroadcastManager:
+    """Sends a message to every user in the users collection.
+
+    Users are streamed by ascending user_id and sent to in chunks with bounded
+    concurrency. Progress is checkpointed in the broadcasts collection after
+    each chunk, so a restart resumes at the last completed chunk and re-sends
+    at most one chunk. Users who blocked the bot are removed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.bucket = TokenBucket(Config.BROADCAST_RATE, Config.BROADCAST_RATE)
+        self.state: Optional[Dict[str, Any]] = None
+        self.progress: Optional[ProgressReporter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._cancel_requested = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._task and not self._task.done())
+
+    async def start(self, source: Message, status_msg: Message) -> bool:
+        """Start broadcasting a message; returns False if a broadcast is already running"""
+        if self.running:
+            return False
+
+        state = {
+            "from_chat_id": source.chat.id,
+            "message_id": source.id,
+            "status_chat_id": status_msg.chat.id,
+            "status_message_id": status_msg.id,
+            "status": "running",
+            "last_user_id": None,
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0,
+            "total": await self.client.db.get_user_count(),
+            "started_at": datetime.now()
+        }
+        state["_id"] = await self.client.db.create_broadcast(state)
+        self._launch(state)
+        return True
+
+    def cancel(self) -> bool:
+        """Cancel the running broadcast"""
+        if not self.running:
+            return False
+        self._cancel_requested = True
+        self._task.cancel()
+        return True
+
+    async def resume_pending(self):
+        """Resume a broadcast interrupted by a restart"""
+        for state in await self.client.db.get_broadcasts(status="running"):
+            if self.running:
+                # Only one broadcast runs at a time; drop stale extras
+                await self.client.db.save_broadcast(state["_id"], {"status": "cancelled"})
+                continue
+            logger.info(f"Resuming broadcast {state['_id']} after user {state.get('last_user_id')}")
+            self._launch(state)
+
+    async def stop(self):
+        """Stop the running broadcast, leaving it to resume on next start"""
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _launch(self, state: Dict[str, Any]):
+        self.state = state
+        self.progress = ProgressReporter(self.client, state["status_chat_id"], state["status_message_id"])
+        self._cancel_requested = False
+        self._task = asyncio.create_task(self._run(state))
+
+    def summary(self) -> str:
+        state = self.state or {}
+        done = state.get("sent", 0) + state.get("failed", 0) + state.get("blocked", 0)
+        return (
+            f"✅ Sent: {state.get('sent', 0):,}\n"
+            f"🚫 Blocked: {state.get('blocked', 0):,}\n"
+            f"❌ Failed: {state.get('failed', 0):,}\n"
+            f"⏳ Progress: {done:,}/{state.get('total', 0):,}"
+        )
+
+    async def _finish(self, header: str):
+        """Show the final status of the broadcast"""
+        await self.progress.finish(f"{header}\n\n{self.summary()}")
+
+    async def _send(self, state: Dict[str, Any], user_id: int, blocked: List[int]):
+        while True:
+            await self.bucket.acquire()
+            try:
+                await self.client.copy_message(user_id, state["from_chat_id"], state["message_id"])
+                state["sent"] += 1
+                return
+            except FloodWait as e:
+                logger.warning(f"FloodWait of {e.value}s during broadcast, pausing all sends")
+                self.bucket.pause(e.value)
+            except (UserIsBlocked, InputUserDeactivated):
+                blocked.append(user_id)
+                state["blocked"] += 1
+                return
+            except Exception as e:
+                state["failed"] += 1
+                logger.debug(f"Failed to send broadcast to {user_id}: {e}")
+                return
+
+    async def _send_chunk(self, state: Dict[str, Any], user_ids: List[int]):
+        """Send to a chunk of users, then checkpoint past it"""
+        semaphore = asyncio.Semaphore(Config.BROADCAST_CONCURRENCY)
+        blocked = []
+
+        async def send(user_id: int):
+            async with semaphore:
+                await self._send(state, user_id, blocked)
+
+        await asyncio.gather(*(send(user_id) for user_id in user_ids))
+
+        if blocked:
+            await self.client.db.remove_users(blocked)
+
+        state["last_user_id"] = user_ids[-1]
+        await self.client.db.save_broadcast(state["_id"], {
+            key: state[key] for key in ("last_user_id", "sent", "failed", "blocked")
+        })
+
+    async def _run(self, state: Dict[str, Any]):
+        db = self.client.db
+
+        try:
+            chunk = []
+            async for user_id in db.iter_user_ids(after=state.get("last_user_id")):
+                chunk.append(user_id)
+                if len(chunk) < BROADCAST_CHUNK_SIZE:
+                    continue
+
+                await self._send_chunk(state, chunk)
+                chunk = []
+                self.progress.update(f"📡 <b>Broadcasting...</b>\n\n{self.summary()}")
+
+            if chunk:
+                await self._send_chunk(state, chunk)
+
+            await db.save_broadcast(state["_id"], {"status": "done", "finished_at": datetime.now()})
+            logger.info(f"Broadcast {state['_id']} complete: {state['sent']} sent, {state['blocked']} blocked")
+            await self._finish("📡 <b>Broadcast Complete!</b>")
+
+        except asyncio.CancelledError:
+            if self._cancel_requested:
+                await db.save_broadcast(state["_id"], {"status": "cancelled"})
+                await self._finish("🛑 <b>Broadcast Cancelled</b>")
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {state['_id']} failed: {e}")
+            await db.save_broadcast(state["_id"], {"status": "failed"})
+            await self._finish(f"❌ <b>Broadcast Failed</b>\n{e}")
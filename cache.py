@@ -0,0 +1,184 @@
+"""
+In-Process Caches
+"""
+
+import asyncio
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from hashlib import blake2b
+from itertools import chain
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a time-to-live"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry, evicting the least recently used one when full"""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value"""
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches the predicate"""
+        stale_keys = [key for key in self._entries if predicate(key)]
+        for key in stale_keys:
+            del self._entries[key]
+        return len(stale_keys)
+
+    def clear(self):
+        """Remove all entries"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight task"""
+
+    def __init__(self):
+        self.shared = 0
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the in-flight call for key, starting func() if there is none.
+
+        The call runs as its own task, so a caller being cancelled never
+        cancels the result the other callers are waiting for.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+class KnownKeySet:
+    """Compact membership set of string keys, stored as 64-bit hashes.
+    
+    The bulk of the keys live in a sorted array at 8 bytes each and are
+    looked up by bisection; recent adds and removes sit in small sets that
+    are merged into the array once they grow. Unlike a Bloom filter, a
+    false positive needs a 64-bit hash collision, so callers can safely
+    skip work for keys reported as known.
+    """
+
+    def __init__(self, merge_threshold: int = 4096):
+        self.merge_threshold = merge_threshold
+        self.ready = False
+        # While a load streams in, changes are only recorded, never merged into the old base
+        self._loading = True
+        self._base = array("Q")
+        self._added: Set[int] = set()
+        self._removed: Set[int] = set()
+
+    @staticmethod
+    def hash_key(key: str) -> int:
+        """64-bit hash a key is stored as"""
+        return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def __len__(self) -> int:
+        return len(self._base) - len(self._removed) + len(self._added)
+
+    def __contains__(self, key: str) -> bool:
+        h = self.hash_key(key)
+        if h in self._added:
+            return True
+        if h in self._removed:
+            return False
+        return self._in_base(h)
+
+    def _in_base(self, h: int) -> bool:
+        index = bisect_left(self._base, h)
+        return index < len(self._base) and self._base[index] == h
+
+    def begin_load(self):
+        """Start recording changes for a reload, before its hashes are read"""
+        self._loading = True
+
+    def load(self, hashes: Iterable[int]):
+        """Replace the base array with the given key hashes.
+        
+        Changes recorded since begin_load() are applied on top, so adds and
+        removes that raced the load stay correct.
+        """
+        self._base = array("Q", sorted(hashes))
+        self._added = {h for h in self._added if not self._in_base(h)}
+        self._removed = {h for h in self._removed if self._in_base(h)}
+        self._loading = False
+        self.ready = True
+
+    def add(self, key: str):
+        h = self.hash_key(key)
+        self._removed.discard(h)
+        if not self._in_base(h):
+            self._added.add(h)
+            self._maybe_merge()
+
+    def discard(self, key: str):
+        h = self.hash_key(key)
+        self._added.discard(h)
+        # While loading, the key may still arrive with the new base array
+        if self._loading or self._in_base(h):
+            self._removed.add(h)
+            self._maybe_merge()
+
+    def _maybe_merge(self):
+        if self._loading or len(self._added) + len(self._removed) < self.merge_threshold:
+            return
+        merged = (h for h in self._base if h not in self._removed)
+        self._base = array("Q", sorted(chain(merged, self._added)))
+        self._added.clear()
+        self._removed.clear()
@@ -21,11 +21,43 @@ class Config:
     CHANNELS = [int(x) for x in os.getenv("CHANNELS", "-").split() if x.strip()]
     AUTH_CHANNEL = int(os.getenv("AUTH_CHANNEL", "0")) if os.getenv("AUTH_CHANNEL") else None
     AUTH_USERS = [int(x) for x in os.getenv("AUTH_USERS", "").split() if x.strip()]
+    SUBSCRIPTION_CACHE_TTL = int(os.getenv("SUBSCRIPTION_CACHE_TTL", "600"))
+    SUBSCRIPTION_NEGATIVE_CACHE_TTL = int(os.getenv("SUBSCRIPTION_NEGATIVE_CACHE_TTL", "30"))
+    ACCESS_CACHE_TTL = int(os.getenv("ACCESS_CACHE_TTL", "30"))
+    BAN_REFRESH_INTERVAL = int(os.getenv("BAN_REFRESH_INTERVAL", "300"))
+    
+    # Broadcast configuration
+    BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+    BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+    PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "5"))
     
     # Search configuration
     CACHE_TIME = int(os.getenv("CACHE_TIME", "300"))
     USE_CAPTION_FILTER = os.getenv("USE_CAPTION_FILTER", "True").lower() == "true"
     MAX_RESULTS = int(os.getenv("MAX_RESULTS", "50"))
+    INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "500"))
+    BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "2"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "5000"))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+    INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5"))
+    KNOWN_FILES_REFRESH_INTERVAL = int(os.getenv("KNOWN_FILES_REFRESH_INTERVAL", "3600"))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "60"))
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "20000"))
+    RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+    
+    # Analytics configuration
+    ANALYTICS_QUEUE_SIZE = int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000"))
+    ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "500"))
+    ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "5"))
+    LIVE_TOP_WINDOW = int(os.getenv("LIVE_TOP_WINDOW", "3600"))
+    LIVE_TOP_CAPACITY = int(os.getenv("LIVE_TOP_CAPACITY", "1000"))
+    LIVE_SNAPSHOT_INTERVAL = int(os.getenv("LIVE_SNAPSHOT_INTERVAL", "60"))
+    SEARCH_LOG_RETENTION_DAYS = int(os.getenv("SEARCH_LOG_RETENTION_DAYS", "30"))
+    HOURLY_STATS_RETENTION_DAYS = int(os.getenv("HOURLY_STATS_RETENTION_DAYS", "180"))
+    LOG_COMPACTION_INTERVAL = int(os.getenv("LOG_COMPACTION_INTERVAL", "3600"))
+    PERCOLATE_INTERVAL = int(os.getenv("PERCOLATE_INTERVAL", "300"))
+    COUNTER_RECONCILE_INTERVAL = int(os.getenv("COUNTER_RECONCILE_INTERVAL", "21600"))
     
     # Validate required configs
     @classmethod
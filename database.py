@@ -4,20 +4,56 @@ Database Operations with MongoDB
 
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import DuplicateKeyError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from analytics import HyperLogLog
+from array import array
+from cache import TTLCache, SingleFlight, KnownKeySet
 from config import Config
-from typing import List, Dict, Any, Optional
+from utils import tokenize, query_tokens, matches_query_tokens, MediaTokenIndex
+from typing import List, Dict, Any, Optional, Tuple
 import re
-from datetime import datetime
+from bson import ObjectId
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Telegram accepts at most 50 results per inline answer
+SEARCH_PAGE_SIZE = min(Config.MAX_RESULTS, 50)
+
+# Media changed at once above which the search cache is cleared instead of matched per document
+BULK_INVALIDATION_LIMIT = 50
+
+# Leading characters of each token stored as search prefixes; longer last words
+# fall back to a regex over the documents sharing their first MAX_PREFIX_LENGTH characters
+MAX_PREFIX_LENGTH = 15
+
+# Fields needed to undo a media document's footprint in caches and counters
+MEDIA_SYNC_PROJECTION = {
+    "file_unique_id": 1, "file_type": 1, "file_size": 1,
+    "file_name": 1, "caption": 1, "search_tokens": 1
+}
+
 class Database:
     def __init__(self):
         self.client = None
         self.db = None
         self.collection = None
         
+        # Search results keyed by tokenized query, type filter and page cursor
+        self.search_cache = TTLCache(Config.SEARCH_CACHE_SIZE, Config.SEARCH_CACHE_TTL)
+        # Bumped on every invalidation so searches that raced an ingest are not cached
+        self.search_cache_generation = 0
+        self.search_flights = SingleFlight()
+        
+        # file_unique_ids already indexed, so re-posts and backfills skip Mongo
+        self.known_files = KnownKeySet()
+        
+        # Banned user ids, mirrored from the banned_users collection
+        self.banned_users = set()
+        # Bans and unbans made while the list is being reloaded, applied on top of it
+        self._ban_changes: Optional[Dict[int, bool]] = None
+        
     async def connect(self):
         """Connect to MongoDB"""
         try:
@@ -28,11 +64,45 @@ class Database:
             # Create optimized indexes for large collections
             await self.collection.create_index([("file_name", "text"), ("caption", "text")])
             await self.collection.create_index("file_unique_id", unique=True)
-            await self.collection.create_index("chat_id")
+            await self.collection.create_index([("chat_id", 1), ("message_id", 1)])  # Edit and delete sync by channel post
             await self.collection.create_index("message_id")
             await self.collection.create_index([("date", -1)])  # For recent media queries
             await self.collection.create_index([("file_type", 1), ("date", -1)])  # Compound index for type + date
             await self.collection.create_index("file_name")  # Additional index for filename searches
+            await self.collection.create_index([("search_tokens", 1), ("date", -1), ("_id", -1)])  # Multikey token index, keyset ordered
+            await self.collection.create_index([("search_prefixes", 1), ("date", -1), ("_id", -1)])  # Edge n-grams for the last, partly typed word
+            await self.db["banned_users"].create_index("user_id")
+            await self.db["users"].create_index("user_id")  # Broadcasts stream users in user_id order
+            
+            # Query rollups maintained at write time for /top10 and /notfound
+            for rollup in ("search_query", "not_found"):
+                await self.db[f"{rollup}_totals"].create_index([("search_count", -1)])
+                await self.db[f"{rollup}_daily"].create_index([("query", 1), ("day", 1)], unique=True)
+                await self.db[f"{rollup}_daily"].create_index([("day", 1), ("search_count", -1)])
+                await self.db[f"{rollup}_hourly"].create_index([("query", 1), ("hour", 1)], unique=True)
+            
+            # Reverse indexes of pending not-found queries for the percolator: every word
+            # but the last by exact token, one-word queries by their (prefix) last word
+            await self.migrate_not_found_tokens()
+            await self.db["not_found_totals"].create_index(
+                "exact_tokens", partialFilterExpression={"resolved": False}
+            )
+            await self.db["not_found_totals"].create_index(
+                [("exact_tokens", 1), ("last_token", 1)], partialFilterExpression={"resolved": False}
+            )
+            
+            # Raw search logs are pruned by compact_search_logs, never ahead of its watermark
+            for raw_collection in ("search_logs", "not_found_searches"):
+                await self.drop_ttl_index(raw_collection, "timestamp")
+                await self.db[raw_collection].create_index("timestamp")
+            await self.ensure_ttl_index("search_query_hourly", "hour", Config.HOURLY_STATS_RETENTION_DAYS)
+            await self.ensure_ttl_index("not_found_hourly", "hour", Config.HOURLY_STATS_RETENTION_DAYS)
+            
+            await self.load_banned_users()
+            
+            # Seed the catalogue counters on first run
+            if not await self.db["counters"].find_one({"_id": "catalogue"}, {"_id": 1}):
+                await self.reconcile_catalogue_counters()
             
             logger.info("Connected to MongoDB successfully")
             
@@ -52,51 +122,247 @@ class Database:
             self.client.close()
             logger.info("Database connection closed")
     
+    async def ensure_ttl_index(self, collection_name: str, field: str, days: int):
+        """Create a TTL index, or update its expiry when the retention setting changed"""
+        expire_after = days * 86400
+        try:
+            await self.db[collection_name].create_index(field, expireAfterSeconds=expire_after)
+        except OperationFailure:
+            # Same key with different options: adjust the existing index in place
+            try:
+                await self.db.command(
+                    "collMod", collection_name,
+                    index={"keyPattern": {field: 1}, "expireAfterSeconds": expire_after}
+                )
+            except OperationFailure as e:
+                logger.error(f"Error updating TTL index on {collection_name}.{field}: {e}")
+    
+    async def drop_ttl_index(self, collection_name: str, field: str):
+        """Drop a TTL index left by an older version, so a plain index can take its place"""
+        try:
+            indexes = await self.db[collection_name].index_information()
+            for name, info in indexes.items():
+                if info.get("key") == [(field, 1)] and "expireAfterSeconds" in info:
+                    await self.db[collection_name].drop_index(name)
+        except OperationFailure as e:
+            logger.error(f"Error dropping TTL index on {collection_name}.{field}: {e}")
+    
+    async def migrate_not_found_tokens(self):
+        """Split the tokens of not-found queries stored by older versions into exact and last tokens"""
+        size = {"$size": "$tokens"}
+        try:
+            await self.db["not_found_totals"].update_many(
+                {"tokens": {"$type": "array"}, "last_token": {"$exists": False}},
+                [{"$set": {
+                    "exact_tokens": {"$cond": [
+                        {"$gt": [size, 1]}, {"$slice": ["$tokens", {"$subtract": [size, 1]}]}, []
+                    ]},
+                    "last_token": {"$ifNull": [{"$arrayElemAt": ["$tokens", -1]}, None]}
+                }}]
+            )
+        except OperationFailure as e:
+            logger.error(f"Error migrating not-found query tokens: {e}")
+        
+        try:
+            # The single token index of older versions is superseded
+            await self.db["not_found_totals"].drop_index("tokens_1")
+        except OperationFailure:
+            pass
+    
+    @staticmethod
+    def build_search_tokens(media_data: Dict[str, Any]) -> List[str]:
+        """Build the token array stored on each media document for searching"""
+        text = media_data.get("file_name") or ""
+        if Config.USE_CAPTION_FILTER:
+            text = f"{text} {media_data.get('caption') or ''}"
+        return sorted(set(tokenize(text)))
+    
+    @staticmethod
+    def build_search_prefixes(tokens: List[str]) -> List[str]:
+        """Build the edge n-grams of search tokens, so a partly typed word is an exact match"""
+        return sorted({
+            token[:length] for token in tokens for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1)
+        })
+    
+    def add_search_tokens(self, media_data: Dict[str, Any]):
+        """Store the search tokens and prefixes on a media document"""
+        media_data["search_tokens"] = self.build_search_tokens(media_data)
+        media_data["search_prefixes"] = self.build_search_prefixes(media_data["search_tokens"])
+    
+    async def load_known_files(self) -> int:
+        """Rebuild the known file set by streaming only the file_unique_id field, picking up other instances' deletes"""
+        # A failed stream leaves the set recording changes until the next load
+        self.known_files.begin_load()
+        try:
+            hashes = array("Q")
+            cursor = self.collection.find({}, {"file_unique_id": 1, "_id": 0}, batch_size=10000)
+            async for doc in cursor:
+                if doc.get("file_unique_id"):
+                    hashes.append(KnownKeySet.hash_key(doc["file_unique_id"]))
+            
+            self.known_files.load(hashes)
+            logger.info(f"Loaded {len(hashes)} known file ids")
+            return len(hashes)
+            
+        except Exception as e:
+            logger.error(f"Error loading known file ids: {e}")
+            return 0
+    
     async def save_media(self, media_data: Dict[str, Any]) -> bool:
         """Save media information to database"""
+        if media_data["file_unique_id"] in self.known_files:
+            return False
+        
         try:
+            self.add_search_tokens(media_data)
             await self.collection.insert_one(media_data)
+            self.known_files.add(media_data["file_unique_id"])
+            self.invalidate_search_cache(media_data)
+            await self._adjust_catalogue_counters([media_data])
             return True
         except DuplicateKeyError:
             # File already exists, skip
+            self.known_files.add(media_data["file_unique_id"])
             return False
         except Exception as e:
             logger.error(f"Error saving media: {e}")
             return False
     
-    async def search_media(self, query: str, file_type: str = None) -> List[Dict[str, Any]]:
-        """Search media by query with optimization for large datasets"""
+    async def save_media_batch(self, media_batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Bulk-upsert new media by file_unique_id; returns (inserted, failed), raising whole-batch errors"""
+        # Collapse repeats inside the batch so each file is upserted once, skipping known files
+        unique_batch = list({
+            media["file_unique_id"]: media for media in media_batch
+            if media["file_unique_id"] not in self.known_files
+        }.values())
+        if not unique_batch:
+            return [], []
+        
+        operations = []
+        for media in unique_batch:
+            self.add_search_tokens(media)
+            operations.append(UpdateOne(
+                {"file_unique_id": media["file_unique_id"]},
+                {"$setOnInsert": media},
+                upsert=True
+            ))
+        
+        failed = set()
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            # Unordered: the rest of the batch still went through. A duplicate key
+            # means a concurrent upsert stored the file first, which is not a failure.
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            failed = {
+                error["index"] for error in e.details.get("writeErrors", [])
+                if error.get("code") != 11000
+            }
+            if failed:
+                logger.error(f"Bulk media save had {len(failed)} write errors")
+        
+        # Both new and already stored files are known from here on
+        for index, media in enumerate(unique_batch):
+            if index not in failed:
+                self.known_files.add(media["file_unique_id"])
+        
+        inserted = []
+        for index, object_id in upserted.items():
+            media = unique_batch[index]
+            media["_id"] = object_id
+            inserted.append(media)
+        
+        if inserted:
+            self.invalidate_search_cache_many(inserted)
+            await self._adjust_catalogue_counters(inserted)
+        
+        return inserted, [unique_batch[index] for index in sorted(failed)]
+    
+    def invalidate_search_cache_many(self, media: List[Dict[str, Any]]):
+        """Drop cached searches affected by many media documents at once"""
+        # Past a handful of files, a full clear is cheaper than matching every cached query
+        if len(media) > BULK_INVALIDATION_LIMIT:
+            self.search_cache_generation += 1
+            self.search_cache.clear()
+        else:
+            for doc in media:
+                self.invalidate_search_cache(doc)
+    
+    def invalidate_search_cache(self, media_data: Dict[str, Any]) -> int:
+        """Drop cached searches whose results the given media could appear in"""
+        file_type = media_data.get("file_type")
+        media_tokens = media_data.get("search_tokens") or self.build_search_tokens(media_data)
+        
+        def is_affected(key) -> bool:
+            if key[0] == "recent_videos":
+                return file_type == "video"
+            _, tokens, type_filter, _ = key
+            if type_filter and type_filter != file_type:
+                return False
+            return matches_query_tokens(tokens, media_tokens)
+        
+        self.search_cache_generation += 1
+        return self.search_cache.invalidate(is_affected)
+    
+    async def search_media(self, query: str, file_type: str = None,
+                           cursor: Optional[Tuple[datetime, ObjectId]] = None) -> List[Dict[str, Any]]:
+        """Search media by query, one page at a time after the given (date, _id) cursor"""
+        tokens = query_tokens(query)
+        if not tokens:
+            # Only punctuation or symbols: nothing can match, rather than everything
+            return []
+        
+        cache_key = ("search", tuple(tokens), file_type, cursor)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Identical concurrent searches share a single database query
+        return await self.search_flights.do(
+            cache_key, lambda: self._find_media(tokens, file_type, cursor, cache_key)
+        )
+    
+    async def _find_media(self, tokens: List[str], file_type: Optional[str],
+                          cursor: Optional[Tuple[datetime, ObjectId]], cache_key) -> List[Dict[str, Any]]:
+        """Run a token search against MongoDB and cache the page"""
+        generation = self.search_cache_generation
+        
         try:
-            # Create search filter
-            search_filter = {}
+            # Create search filter; imported placeholders have no file id to send yet
+            search_filter = {"needs_file_id": {"$ne": True}}
             
             # Add file type filter if specified (use compound index)
             if file_type:
                 search_filter["file_type"] = file_type
             
-            # Text search in file name and caption
-            if query.strip():
-                # Use more efficient regex patterns
-                escaped_query = re.escape(query.strip())
+            # Token search: every query word must match a stored token, the last one
+            # by prefix so results update while the user is still typing. The prefix is
+            # an exact search_prefixes match too, so the index supplies the date order.
+            if tokens:
+                *full_tokens, last_token = tokens
+                token_conditions = [{"search_tokens": token} for token in full_tokens]
+                token_conditions.append({"search_prefixes": last_token[:MAX_PREFIX_LENGTH]})
+                if len(last_token) > MAX_PREFIX_LENGTH:
+                    token_conditions.append({"search_tokens": {"$regex": f"^{re.escape(last_token)}"}})
                 
-                # Prioritize exact matches and prefix matches for better performance
-                or_conditions = [
-                    {"file_name": {"$regex": f"^{escaped_query}", "$options": "i"}},  # Prefix match (faster)
-                    {"file_name": {"$regex": escaped_query, "$options": "i"}},       # Full text match
-                ]
-                
-                # Add caption search only if query is longer than 3 characters (avoid too broad searches)
-                if len(query.strip()) > 3:
-                    or_conditions.extend([
-                        {"caption": {"$regex": f"^{escaped_query}", "$options": "i"}},
-                        {"caption": {"$regex": escaped_query, "$options": "i"}}
-                    ])
-                
-                search_filter["$or"] = or_conditions
+                if len(token_conditions) == 1:
+                    search_filter.update(token_conditions[0])
+                else:
+                    search_filter["$and"] = token_conditions
+            
+            # Keyset pagination: continue strictly after the last result of the previous page
+            if cursor:
+                last_date, last_id = cursor
+                search_filter.setdefault("$and", []).append({"$or": [
+                    {"date": {"$lt": last_date}},
+                    {"date": last_date, "_id": {"$lt": last_id}}
+                ]})
             
             # Use projection to reduce memory usage - only fetch needed fields
             projection = {
                 "file_id": 1,
+                "file_unique_id": 1,
                 "file_name": 1,
                 "file_size": 1,
                 "file_type": 1,
@@ -105,12 +371,14 @@ class Database:
             }
             
             # Execute search with optimizations
-            cursor = self.collection.find(
+            db_cursor = self.collection.find(
                 search_filter, 
                 projection
-            ).sort("date", -1).limit(Config.MAX_RESULTS)
+            ).sort([("date", -1), ("_id", -1)]).limit(SEARCH_PAGE_SIZE)
             
-            results = await cursor.to_list(length=Config.MAX_RESULTS)
+            results = await db_cursor.to_list(length=SEARCH_PAGE_SIZE)
+            if generation == self.search_cache_generation:
+                self.search_cache.set(cache_key, results)
             
             return results
             
@@ -118,61 +386,249 @@ class Database:
             logger.error(f"Error searching media: {e}")
             return []
     
-    async def get_stats(self) -> Dict[str, Any]:
-        """Get database statistics"""
+    async def backfill_search_tokens(self, batch_size: int = 1000) -> int:
+        """Add search tokens and prefixes to media documents indexed before they existed"""
+        updated = 0
         try:
-            total_files = await self.collection.count_documents({})
+            cursor = self.collection.find(
+                {"search_prefixes": {"$exists": False}},
+                {"file_name": 1, "caption": 1}
+            )
             
-            # Count by file type
-            pipeline = [
-                {"$group": {"_id": "$file_type", "count": {"$sum": 1}}}
-            ]
+            operations = []
+            async for doc in cursor:
+                self.add_search_tokens(doc)
+                operations.append(UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {"search_tokens": doc["search_tokens"], "search_prefixes": doc["search_prefixes"]}}
+                ))
+                
+                if len(operations) >= batch_size:
+                    await self.collection.bulk_write(operations, ordered=False)
+                    updated += len(operations)
+                    operations = []
             
-            type_counts = {}
-            async for doc in self.collection.aggregate(pipeline):
-                type_counts[doc["_id"]] = doc["count"]
+            if operations:
+                await self.collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+            
+            if updated:
+                logger.info(f"Backfilled search tokens for {updated} media files")
+            return updated
+            
+        except Exception as e:
+            logger.error(f"Error backfilling search tokens: {e}")
+            return updated
+
+    async def get_index_checkpoint(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Get the backfill checkpoint of a channel"""
+        try:
+            return await self.db["index_checkpoints"].find_one({"_id": chat_id})
+        except Exception as e:
+            logger.error(f"Error loading index checkpoint for {chat_id}: {e}")
+            return None
+
+    async def get_index_checkpoints(self, status: str = None) -> List[Dict[str, Any]]:
+        """Get backfill checkpoints, optionally only those in a given status"""
+        try:
+            query = {"status": status} if status else {}
+            return await self.db["index_checkpoints"].find(query).to_list(length=None)
+        except Exception as e:
+            logger.error(f"Error loading index checkpoints: {e}")
+            return []
+
+    async def save_index_checkpoint(self, chat_id: int, fields: Dict[str, Any]) -> bool:
+        """Update the backfill checkpoint of a channel"""
+        try:
+            await self.db["index_checkpoints"].update_one(
+                {"_id": chat_id},
+                {"$set": {**fields, "updated_at": datetime.now()}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error saving index checkpoint for {chat_id}: {e}")
+            return False
+
+    async def reset_index_checkpoint(self, chat_id: int) -> bool:
+        """Forget a channel's checkpoint so its next backfill reads the whole history"""
+        try:
+            await self.db["index_checkpoints"].delete_one({"_id": chat_id})
+            return True
+        except Exception as e:
+            logger.error(f"Error resetting index checkpoint for {chat_id}: {e}")
+            return False
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get database statistics from the materialized catalogue counters"""
+        try:
+            counters = await self.db["counters"].find_one({"_id": "catalogue"})
+            types = (counters or {}).get("types", {})
+            
+            type_counts = {
+                file_type: values.get("count", 0)
+                for file_type, values in types.items()
+                if values.get("count", 0) > 0
+            }
             
             return {
-                "total_files": total_files,
+                "total_files": sum(type_counts.values()),
+                "total_size": sum(values.get("total_size", 0) for values in types.values()),
                 "by_type": type_counts
             }
             
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
-            return {"total_files": 0, "by_type": {}}
+            return {"total_files": 0, "total_size": 0, "by_type": {}}
+    
+    async def _adjust_catalogue_counters(self, media: List[Dict[str, Any]], sign: int = 1):
+        """Apply added (sign=1) or removed (sign=-1) media to the catalogue counters"""
+        increments = {}
+        for doc in media:
+            file_type = doc.get("file_type") or "unknown"
+            count_key = f"types.{file_type}.count"
+            size_key = f"types.{file_type}.total_size"
+            increments[count_key] = increments.get(count_key, 0) + sign
+            increments[size_key] = increments.get(size_key, 0) + sign * (doc.get("file_size") or 0)
+        
+        if increments:
+            try:
+                await self.db["counters"].update_one({"_id": "catalogue"}, {"$inc": increments}, upsert=True)
+            except Exception as e:
+                logger.error(f"Error updating catalogue counters: {e}")
+    
+    async def reconcile_catalogue_counters(self) -> bool:
+        """Recompute the catalogue counters from the media collection to correct any drift"""
+        try:
+            pipeline = [
+                {"$group": {
+                    "_id": "$file_type",
+                    "count": {"$sum": 1},
+                    "total_size": {"$sum": "$file_size"}
+                }}
+            ]
+            
+            types = {}
+            async for doc in self.collection.aggregate(pipeline):
+                types[doc["_id"] or "unknown"] = {"count": doc["count"], "total_size": doc["total_size"]}
+            
+            await self.db["counters"].replace_one(
+                {"_id": "catalogue"},
+                {"types": types, "reconciled_at": datetime.now()},
+                upsert=True
+            )
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error reconciling catalogue counters: {e}")
+            return False
+    
+    async def upsert_media(self, media_data: Dict[str, Any]) -> bool:
+        """Replace the document of an edited channel post in place, inserting it if missing"""
+        try:
+            self.add_search_tokens(media_data)
+            previous = await self.collection.find_one_and_replace(
+                {"chat_id": media_data["chat_id"], "message_id": media_data["message_id"]},
+                media_data,
+                projection=MEDIA_SYNC_PROJECTION,
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The post now holds a file indexed from another post; drop this post's stale copy
+            logger.debug(f"Edited media is already indexed: {media_data['file_name']}")
+            await self.delete_media(media_data["chat_id"], media_data["message_id"])
+            return False
+        except Exception as e:
+            logger.error(f"Error updating media: {e}")
+            return False
+        
+        if previous:
+            self._forget_media([previous])
+            await self._adjust_catalogue_counters([previous], sign=-1)
+        self.known_files.add(media_data["file_unique_id"])
+        self.invalidate_search_cache(media_data)
+        await self._adjust_catalogue_counters([media_data])
+        return True
+    
+    def _forget_media(self, media: List[Dict[str, Any]]):
+        """Drop removed media from the known file set and the search cache"""
+        for doc in media:
+            self.known_files.discard(doc["file_unique_id"])
+        self.invalidate_search_cache_many(media)
     
     async def delete_media(self, chat_id: int, message_id: int) -> bool:
         """Delete media from database"""
         try:
-            result = await self.collection.delete_one({
-                "chat_id": chat_id,
-                "message_id": message_id
-            })
-            return result.deleted_count > 0
+            deleted = await self.collection.find_one_and_delete(
+                {"chat_id": chat_id, "message_id": message_id},
+                projection=MEDIA_SYNC_PROJECTION
+            )
+            if deleted is None:
+                return False
+            
+            self._forget_media([deleted])
+            await self._adjust_catalogue_counters([deleted], sign=-1)
+            return True
         except Exception as e:
             logger.error(f"Error deleting media: {e}")
             return False
     
-    async def get_total_size(self) -> int:
-        """Get total size of all files in bytes"""
+    async def get_indexed_message_ids(self, chat_id: int, message_ids: List[int]) -> set:
+        """Get which of a channel's posts already have a media document"""
         try:
-            pipeline = [
-                {"$group": {"_id": None, "total_size": {"$sum": "$file_size"}}}
-            ]
+            cursor = self.collection.find(
+                {"chat_id": chat_id, "message_id": {"$in": message_ids}},
+                {"message_id": 1, "_id": 0}
+            )
+            return {doc["message_id"] async for doc in cursor}
+        except Exception as e:
+            logger.error(f"Error checking indexed messages: {e}")
+            return set()
+    
+    async def get_unresolved_message_ids(self, chat_id: int) -> List[int]:
+        """Get the posts of a channel imported from an export that still need a file id"""
+        try:
+            cursor = self.collection.find(
+                {"chat_id": chat_id, "needs_file_id": True},
+                {"message_id": 1, "_id": 0}
+            ).sort("message_id", 1)
+            return [doc["message_id"] async for doc in cursor]
+        except Exception as e:
+            logger.error(f"Error loading unresolved media: {e}")
+            return []
+    
+    async def delete_media_batch(self, chat_id: int, message_ids: List[int]) -> int:
+        """Delete the media of many posts of a channel with one delete_many"""
+        try:
+            docs = await self.collection.find(
+                {"chat_id": chat_id, "message_id": {"$in": message_ids}},
+                MEDIA_SYNC_PROJECTION
+            ).to_list(length=None)
+            if not docs:
+                return 0
             
-            result = await self.collection.aggregate(pipeline).to_list(1)
-            return result[0]["total_size"] if result else 0
+            # Delete exactly the documents accounted for below
+            result = await self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
             
+            self._forget_media(docs)
+            await self._adjust_catalogue_counters(docs, sign=-1)
+            return result.deleted_count
         except Exception as e:
-            logger.error(f"Error getting total size: {e}")
+            logger.error(f"Error deleting media batch: {e}")
             return 0
     
+    async def get_total_size(self) -> int:
+        """Get total size of all files in bytes"""
+        stats = await self.get_stats()
+        return stats["total_size"]
+    
     async def get_recent_media(self, limit: int = 25) -> List[Dict[str, Any]]:
         """Get recent media files, optimized for large collections"""
         try:
             # Use compound index for better performance on large collections
             projection = {
                 "file_id": 1,
+                "file_unique_id": 1,
                 "file_name": 1,
                 "file_size": 1,
                 "file_type": 1,
@@ -182,7 +638,7 @@ class Database:
             
             # Get recent videos first (most requested content type)
             video_cursor = self.collection.find(
-                {"file_type": "video"},
+                {"file_type": "video", "needs_file_id": {"$ne": True}},
                 projection
             ).sort("date", -1).limit(limit)
             
@@ -197,7 +653,8 @@ class Database:
                 other_cursor = self.collection.find(
                     {
                         "file_type": {"$ne": "video"},
-                        "file_id": {"$nin": video_ids}
+                        "file_id": {"$nin": video_ids},
+                        "needs_file_id": {"$ne": True}
                     },
                     projection
                 ).sort("date", -1).limit(remaining_limit)
@@ -213,9 +670,21 @@ class Database:
     
     async def get_recent_videos(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent videos specifically for empty queries"""
+        cache_key = ("recent_videos", limit)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        return await self.search_flights.do(cache_key, lambda: self._find_recent_videos(limit, cache_key))
+    
+    async def _find_recent_videos(self, limit: int, cache_key) -> List[Dict[str, Any]]:
+        """Fetch the most recent videos from MongoDB and cache them"""
+        generation = self.search_cache_generation
+        
         try:
             projection = {
                 "file_id": 1,
+                "file_unique_id": 1,
                 "file_name": 1,
                 "file_size": 1,
                 "file_type": 1,
@@ -225,11 +694,13 @@ class Database:
             
             # Get only videos, sorted by most recent
             cursor = self.collection.find(
-                {"file_type": "video"},
+                {"file_type": "video", "needs_file_id": {"$ne": True}},
                 projection
             ).sort("date", -1).limit(limit)
             
             results = await cursor.to_list(length=limit)
+            if generation == self.search_cache_generation:
+                self.search_cache.set(cache_key, results)
             return results
             
         except Exception as e:
@@ -245,6 +716,9 @@ class Database:
                 {"$set": {"user_id": user_id, "banned_at": datetime.now()}},
                 upsert=True
             )
+            self.banned_users.add(user_id)
+            if self._ban_changes is not None:
+                self._ban_changes[user_id] = True
             return True
         except Exception as e:
             logger.error(f"Error banning user {user_id}: {e}")
@@ -255,20 +729,42 @@ class Database:
         try:
             banned_collection = self.db["banned_users"]
             await banned_collection.delete_one({"user_id": user_id})
+            self.banned_users.discard(user_id)
+            if self._ban_changes is not None:
+                self._ban_changes[user_id] = False
             return True
         except Exception as e:
             logger.error(f"Error unbanning user {user_id}: {e}")
             return False
     
-    async def is_banned(self, user_id: int) -> bool:
-        """Check if a user is banned"""
+    async def load_banned_users(self) -> int:
+        """Reload the in-memory ban list, picking up bans made by other instances"""
+        self._ban_changes = {}
         try:
             banned_collection = self.db["banned_users"]
-            result = await banned_collection.find_one({"user_id": user_id})
-            return result is not None
+            banned_users = {
+                doc["user_id"]
+                async for doc in banned_collection.find({}, {"user_id": 1, "_id": 0})
+            }
+            
+            # The cursor may have missed bans made while it was being read
+            for user_id, banned in self._ban_changes.items():
+                if banned:
+                    banned_users.add(user_id)
+                else:
+                    banned_users.discard(user_id)
+            
+            self.banned_users = banned_users
+            return len(self.banned_users)
         except Exception as e:
-            logger.error(f"Error checking if user {user_id} is banned: {e}")
-            return False
+            logger.error(f"Error loading banned users: {e}")
+            return len(self.banned_users)
+        finally:
+            self._ban_changes = None
+    
+    async def is_banned(self, user_id: int) -> bool:
+        """Check if a user is banned"""
+        return user_id in self.banned_users
     
     async def get_user_count(self) -> int:
         """Get total number of users who have used the bot"""
@@ -301,17 +797,61 @@ class Database:
             logger.error(f"Error adding user {user_id}: {e}")
             return False
     
+    async def iter_user_ids(self, after: int = None):
+        """Stream user ids in ascending order, optionally starting after a given id"""
+        query = {"user_id": {"$gt": after}} if after is not None else {}
+        cursor = self.db["users"].find(query, {"user_id": 1, "_id": 0}).sort("user_id", 1).batch_size(1000)
+        async for doc in cursor:
+            yield doc["user_id"]
+    
+    async def remove_users(self, user_ids: List[int]) -> int:
+        """Remove users the bot can no longer reach"""
+        try:
+            result = await self.db["users"].delete_many({"user_id": {"$in": user_ids}})
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"Error removing users: {e}")
+            return 0
+    
+    async def create_broadcast(self, broadcast: Dict[str, Any]) -> ObjectId:
+        """Record a new broadcast and return its id"""
+        result = await self.db["broadcasts"].insert_one({**broadcast, "updated_at": datetime.now()})
+        return result.inserted_id
+    
+    async def save_broadcast(self, broadcast_id: ObjectId, fields: Dict[str, Any]) -> bool:
+        """Update the progress of a broadcast"""
+        try:
+            await self.db["broadcasts"].update_one(
+                {"_id": broadcast_id},
+                {"$set": {**fields, "updated_at": datetime.now()}}
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error saving broadcast {broadcast_id}: {e}")
+            return False
+    
+    async def get_broadcasts(self, status: str = None) -> List[Dict[str, Any]]:
+        """Get broadcasts, optionally only those in a given status"""
+        try:
+            query = {"status": status} if status else {}
+            return await self.db["broadcasts"].find(query).sort("started_at", 1).to_list(length=None)
+        except Exception as e:
+            logger.error(f"Error loading broadcasts: {e}")
+            return []
+    
     async def log_search_query(self, user_id: int, query: str, username: str = None) -> bool:
         """Log search query for analytics"""
         try:
             # Log the search query
             search_logs_collection = self.db["search_logs"]
-            await search_logs_collection.insert_one({
+            entry = {
                 "user_id": user_id,
                 "username": username,
                 "query": query.strip().lower(),
                 "timestamp": datetime.now()
-            })
+            }
+            await search_logs_collection.insert_one(entry)
+            await self._update_query_rollups("search_query", [entry])
             
             # Increment user's search count
             users_collection = self.db["users"]
@@ -326,32 +866,270 @@ class Database:
             logger.error(f"Error logging search query: {e}")
             return False
     
-    async def get_top_searched_movies(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get top searched movie queries"""
+    async def _update_query_rollups(self, rollup: str, entries: List[Dict[str, Any]]):
+        """Fold logged searches into the <rollup>_totals and <rollup>_daily counters"""
+        # Not-found rollups also keep a sparse HyperLogLog of the searching users
+        # under "hll", merged in place with a per-register $max
+        track_users = rollup == "not_found"
+        totals = {}
+        daily = {}
+        for entry in entries:
+            query = entry["query"]
+            if not query:
+                continue
+            timestamp = entry["timestamp"]
+            day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+            register = HyperLogLog.register_for(entry["user_id"]) if track_users else None
+            
+            for bucket, key in ((totals, query), (daily, (query, day))):
+                count, last_searched, registers = bucket.get(key, (0, timestamp, {}))
+                if register:
+                    index, rank = register
+                    registers[index] = max(registers.get(index, 0), rank)
+                bucket[key] = (count + 1, max(last_searched, timestamp), registers)
+        
+        if not totals:
+            return
+        
+        def rollup_update(count, last_searched, registers, fields=None):
+            maxima = {"last_searched": last_searched}
+            maxima.update({f"hll.{index}": rank for index, rank in registers.items()})
+            update = {"$inc": {"search_count": count}, "$max": maxima}
+            if fields:
+                update["$set"] = fields
+            return update
+        
+        # A fresh miss reopens a not-found query and keeps its tokens for the percolator
+        def pending_fields(query, with_tokens):
+            if not track_users:
+                return None
+            fields = {"resolved": False}
+            if with_tokens:
+                tokens = query_tokens(query)
+                fields.update({
+                    "tokens": tokens,
+                    "exact_tokens": tokens[:-1],
+                    "last_token": tokens[-1] if tokens else None
+                })
+            return fields
+        
+        await self.db[f"{rollup}_totals"].bulk_write([
+            UpdateOne({"_id": query}, rollup_update(*values, pending_fields(query, True)), upsert=True)
+            for query, values in totals.items()
+        ], ordered=False)
+        
+        await self.db[f"{rollup}_daily"].bulk_write([
+            UpdateOne({"query": query, "day": day}, rollup_update(*values, pending_fields(query, False)), upsert=True)
+            for (query, day), values in daily.items()
+        ], ordered=False)
+    
+    async def _top_daily_queries(self, rollup: str, limit: int, days: int) -> List[Dict[str, Any]]:
+        """Sum the last `days` daily buckets of a query rollup and return the top queries"""
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        pipeline = [
+            {"$match": {"day": {"$gte": since}, "resolved": {"$ne": True}}},
+            {"$group": {
+                "_id": "$query",
+                "search_count": {"$sum": "$search_count"},
+                "last_searched": {"$max": "$last_searched"}
+            }},
+            {"$sort": {"search_count": -1}},
+            {"$limit": limit}
+        ]
+        return await self.db[f"{rollup}_daily"].aggregate(pipeline).to_list(limit)
+    
+    async def _top_hourly_queries(self, rollup: str, limit: int, hours: int) -> List[Dict[str, Any]]:
+        """Sum the last `hours` compacted hourly buckets of a query rollup and return the top queries"""
+        since = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+        pipeline = [
+            {"$match": {"hour": {"$gte": since}}},
+            {"$group": {
+                "_id": "$query",
+                "search_count": {"$sum": "$search_count"},
+                "last_searched": {"$max": "$hour"}
+            }},
+            # Compaction rewrites the hourly buckets, so the resolved flag is read from the totals
+            {"$lookup": {
+                "from": f"{rollup}_totals",
+                "localField": "_id",
+                "foreignField": "_id",
+                "as": "totals"
+            }},
+            {"$match": {"totals.resolved": {"$ne": True}}},
+            {"$project": {"totals": 0}},
+            {"$sort": {"search_count": -1}},
+            {"$limit": limit}
+        ]
+        return await self.db[f"{rollup}_hourly"].aggregate(pipeline).to_list(limit)
+    
+    async def compact_search_logs(self, max_hours: int = 24) -> int:
+        """Roll complete hours of raw search logs into the hourly rollups, at most `max_hours` per pass"""
+        # Hours are merged with "replace", so a pass interrupted before the watermark moves can be repeated
+        maintenance = self.db["maintenance"]
+        compacted_hours = 0
         try:
-            search_logs_collection = self.db["search_logs"]
+            state = await maintenance.find_one({"_id": "search_log_compaction"})
+            since = state["compacted_until"] if state else await self._oldest_search_log_hour()
+            # Leave a grace period for events still waiting in the analytics queue
+            until_limit = (datetime.now() - timedelta(minutes=5)).replace(minute=0, second=0, microsecond=0)
             
-            # Aggregate search queries
-            pipeline = [
-                {"$match": {"query": {"$ne": ""}}},  # Exclude empty queries
-                {"$group": {
-                    "_id": "$query",
-                    "search_count": {"$sum": 1},
-                    "last_searched": {"$max": "$timestamp"}
-                }},
-                {"$sort": {"search_count": -1}},
-                {"$limit": limit}
-            ]
+            while since and since < until_limit:
+                until = min(since + timedelta(hours=max_hours), until_limit)
+                
+                for raw_collection, rollup in (("search_logs", "search_query"), ("not_found_searches", "not_found")):
+                    pipeline = [
+                        {"$match": {"timestamp": {"$gte": since, "$lt": until}, "query": {"$ne": ""}}},
+                        {"$group": {
+                            "_id": {
+                                "query": "$query",
+                                "hour": {"$dateFromParts": {
+                                    "year": {"$year": "$timestamp"},
+                                    "month": {"$month": "$timestamp"},
+                                    "day": {"$dayOfMonth": "$timestamp"},
+                                    "hour": {"$hour": "$timestamp"}
+                                }}
+                            },
+                            "search_count": {"$sum": 1}
+                        }},
+                        {"$project": {
+                            "_id": 0,
+                            "query": "$_id.query",
+                            "hour": "$_id.hour",
+                            "search_count": 1
+                        }},
+                        {"$merge": {
+                            "into": f"{rollup}_hourly",
+                            "on": ["query", "hour"],
+                            "whenMatched": "replace",
+                            "whenNotMatched": "insert"
+                        }}
+                    ]
+                    await self.db[raw_collection].aggregate(pipeline).to_list(None)
+                
+                await maintenance.update_one(
+                    {"_id": "search_log_compaction"},
+                    {"$set": {"compacted_until": until}},
+                    upsert=True
+                )
+                compacted_hours += int((until - since).total_seconds() // 3600)
+                since = until
             
-            results = []
-            async for doc in search_logs_collection.aggregate(pipeline):
-                results.append({
+            if compacted_hours:
+                logger.info(f"Compacted {compacted_hours} hours of search logs")
+            
+            # Expired raw logs are only deleted once compacted, so a stalled compaction loses nothing
+            if since:
+                cutoff = min(since, datetime.now() - timedelta(days=Config.SEARCH_LOG_RETENTION_DAYS))
+                for raw_collection in ("search_logs", "not_found_searches"):
+                    result = await self.db[raw_collection].delete_many({"timestamp": {"$lt": cutoff}})
+                    if result.deleted_count:
+                        logger.info(f"Pruned {result.deleted_count} compacted {raw_collection} entries")
+            return compacted_hours
+            
+        except Exception as e:
+            logger.error(f"Error compacting search logs: {e}")
+            return compacted_hours
+    
+    async def _oldest_search_log_hour(self) -> Optional[datetime]:
+        """Get the hour of the oldest raw search log, where compaction starts"""
+        oldest = None
+        for raw_collection in ("search_logs", "not_found_searches"):
+            doc = await self.db[raw_collection].find_one({}, {"timestamp": 1}, sort=[("timestamp", 1)])
+            if doc and (oldest is None or doc["timestamp"] < oldest):
+                oldest = doc["timestamp"]
+        return oldest.replace(minute=0, second=0, microsecond=0) if oldest else None
+    
+    async def resolve_not_found_queries(self, media: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Mark pending not-found queries answered by newly indexed media as resolved"""
+        try:
+            token_lists = [doc.get("search_tokens") or self.build_search_tokens(doc) for doc in media]
+            index = MediaTokenIndex(token_lists)
+            if not index.sorted_tokens:
+                return []
+            
+            # Candidates need all their exact words among the batch tokens; only the last
+            # word of one-word queries is looked up by the prefixes of the batch tokens
+            prefixes = {
+                token[:length] for token in index.sorted_tokens for length in range(1, len(token) + 1)
+            }
+            candidates = self.db["not_found_totals"].find(
+                {"resolved": False, "$or": [
+                    {"exact_tokens": {"$in": index.sorted_tokens, "$not": {"$elemMatch": {"$nin": index.sorted_tokens}}}},
+                    {"exact_tokens": [], "last_token": {"$in": list(prefixes)}}
+                ]},
+                {"tokens": 1, "search_count": 1}
+            )
+            
+            resolved = []
+            async for candidate in candidates:
+                position = index.first_match(candidate.get("tokens", []))
+                if position is not None:
+                    resolved.append({
+                        "query": candidate["_id"],
+                        "search_count": candidate.get("search_count", 0),
+                        "file_name": media[position].get("file_name")
+                    })
+            
+            if resolved:
+                queries = [match["query"] for match in resolved]
+                now = datetime.now()
+                await self.db["not_found_totals"].update_many(
+                    {"_id": {"$in": queries}},
+                    {"$set": {"resolved": True, "resolved_at": now}}
+                )
+                await self.db["not_found_daily"].update_many(
+                    {"query": {"$in": queries}},
+                    {"$set": {"resolved": True}}
+                )
+            
+            return resolved
+            
+        except Exception as e:
+            logger.error(f"Error resolving not-found queries: {e}")
+            return []
+    
+    async def save_analytics_snapshot(self, name: str, data: Dict[str, Any]) -> bool:
+        """Store an in-process analytics snapshot"""
+        try:
+            await self.db["analytics_snapshots"].replace_one(
+                {"_id": name},
+                {**data, "saved_at": datetime.now()},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error saving analytics snapshot {name}: {e}")
+            return False
+    
+    async def load_analytics_snapshot(self, name: str) -> Optional[Dict[str, Any]]:
+        """Load an in-process analytics snapshot"""
+        try:
+            return await self.db["analytics_snapshots"].find_one({"_id": name})
+        except Exception as e:
+            logger.error(f"Error loading analytics snapshot {name}: {e}")
+            return None
+    
+    async def get_top_searched_movies(self, limit: int = 10, days: int = None, hours: int = None) -> List[Dict[str, Any]]:
+        """Get top searched movie queries, all time or over the last `days` days or `hours` hours"""
+        try:
+            if hours:
+                docs = await self._top_hourly_queries("search_query", limit, hours)
+            elif days:
+                docs = await self._top_daily_queries("search_query", limit, days)
+            else:
+                # Indexed top-k read over the rollup maintained by the analytics writer
+                docs = await self.db["search_query_totals"].find({}).sort(
+                    "search_count", -1
+                ).limit(limit).to_list(limit)
+            
+            return [
+                {
                     "query": doc["_id"],
                     "search_count": doc["search_count"],
-                    "last_searched": doc["last_searched"]
-                })
-            
-            return results
+                    "last_searched": doc.get("last_searched")
+                }
+                for doc in docs
+            ]
             
         except Exception as e:
             logger.error(f"Error getting top searched movies: {e}")
@@ -387,48 +1165,92 @@ class Database:
         """Log search query that returned no results"""
         try:
             not_found_collection = self.db["not_found_searches"]
-            await not_found_collection.insert_one({
+            entry = {
                 "user_id": user_id,
                 "username": username,
                 "query": query.strip().lower(),
                 "timestamp": datetime.now()
-            })
+            }
+            await not_found_collection.insert_one(entry)
+            await self._update_query_rollups("not_found", [entry])
             return True
         except Exception as e:
             logger.error(f"Error logging not found search: {e}")
             return False
     
-    async def get_most_searched_not_found(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get most searched queries that returned no results"""
+    async def log_search_batch(self, events: List[Dict[str, Any]]) -> bool:
+        """Write a batch of search events: raw logs, not-found logs and per-user counters"""
+        if not events:
+            return True
         try:
-            not_found_collection = self.db["not_found_searches"]
+            search_logs = []
+            not_found_logs = []
+            user_searches = {}
             
-            pipeline = [
-                {"$match": {"query": {"$ne": ""}}},  # Exclude empty queries
-                {"$group": {
-                    "_id": "$query",
-                    "search_count": {"$sum": 1},
-                    "last_searched": {"$max": "$timestamp"},
-                    "users_searched": {"$addToSet": "$user_id"}
-                }},
-                {"$addFields": {
-                    "unique_users": {"$size": "$users_searched"}
-                }},
-                {"$sort": {"search_count": -1}},
-                {"$limit": limit}
-            ]
+            for event in events:
+                entry = {
+                    "user_id": event["user_id"],
+                    "username": event.get("username"),
+                    "query": event["query"].strip().lower(),
+                    "timestamp": event["timestamp"]
+                }
+                search_logs.append(entry)
+                if not event["found"]:
+                    not_found_logs.append(dict(entry))
+                user_searches[event["user_id"]] = user_searches.get(event["user_id"], 0) + 1
             
-            results = []
-            async for doc in not_found_collection.aggregate(pipeline):
-                results.append({
+            await self.db["search_logs"].insert_many(search_logs, ordered=False)
+            await self._update_query_rollups("search_query", search_logs)
+            if not_found_logs:
+                await self.db["not_found_searches"].insert_many(not_found_logs, ordered=False)
+                await self._update_query_rollups("not_found", not_found_logs)
+            await self.db["users"].bulk_write([
+                UpdateOne({"user_id": user_id}, {"$inc": {"search_count": count}}, upsert=True)
+                for user_id, count in user_searches.items()
+            ], ordered=False)
+            
+            return True
+        except Exception as e:
+            logger.error(f"Error logging search batch of {len(events)} events: {e}")
+            return False
+    
+    async def get_most_searched_not_found(self, limit: int = 10, days: int = None, hours: int = None) -> List[Dict[str, Any]]:
+        """Get most searched queries that returned no results, all time or over the last `days` days or `hours` hours"""
+        try:
+            if hours:
+                # Hourly buckets carry no user sketches
+                docs = await self._top_hourly_queries("not_found", limit, hours)
+            elif days:
+                docs = await self._top_daily_queries("not_found", limit, days)
+                
+                # Unique users over the window: merge the daily sketches of the top queries
+                since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+                sketches = {doc["_id"]: HyperLogLog() for doc in docs}
+                async for daily in self.db["not_found_daily"].find(
+                    {"query": {"$in": list(sketches)}, "day": {"$gte": since}},
+                    {"query": 1, "hll": 1}
+                ):
+                    sketches[daily["query"]].merge_registers(daily.get("hll", {}))
+                for doc in docs:
+                    doc["hll"] = sketches[doc["_id"]]
+            else:
+                # Indexed top-k read over the rollup maintained by the analytics writer
+                docs = await self.db["not_found_totals"].find({"resolved": {"$ne": True}}).sort(
+                    "search_count", -1
+                ).limit(limit).to_list(limit)
+                for doc in docs:
+                    doc["hll"] = HyperLogLog.from_registers(doc.get("hll", {}))
+            
+            return [
+                {
                     "query": doc["_id"],
                     "search_count": doc["search_count"],
-                    "unique_users": doc["unique_users"],
-                    "last_searched": doc["last_searched"]
-                })
-            
-            return results
+                    "unique_users": doc["hll"].count() if "hll" in doc else None,
+                    "last_searched": doc.get("last_searched")
+                }
+                for doc in docs
+            ]
             
         except Exception as e:
             logger.error(f"Error getting most searched not found: {e}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Telegram Desktop Export Importer
+--------------------------------
+Seeds the media collection from a channel's Telegram Desktop JSON export
+(result.json) without calling Telegram. Exports carry no file ids, so the
+entries are stored as placeholders flagged `needs_file_id`; they stay out
+of search until the /resolve admin command fetches their file ids.
+
+Usage: python importer.py path/to/result.json [--chat-id -1001234567890]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, TextIO
+from config import Config
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Export media types the channel handler indexes; voice notes, round videos and stickers are not
+EXPORT_MEDIA_TYPES = {
+    "video_file": "video",
+    "audio_file": "audio",
+    "animation": "gif"
+}
+
+class ExportReader:
+    """Incremental reader for a single-chat Telegram Desktop export.
+
+    Only one message is decoded at a time, so memory stays flat however
+    large the export is. Top-level fields other than `messages` are kept
+    in `header`.
+    """
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, fp: TextIO):
+        self.fp = fp
+        self.header: Dict[str, Any] = {}
+        self._buffer = ""
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.fp.read(self.CHUNK_SIZE)
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the end"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Malformed export: expected '{char}'")
+        self._pos += 1
+
+    def _skip_comma(self):
+        if self._peek() == ",":
+            self._pos += 1
+
+    def _decode(self) -> Any:
+        """Decode the next JSON value, reading more of the file while it is incomplete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def messages(self) -> Iterator[Dict[str, Any]]:
+        """Yield the exported messages one by one"""
+        self._expect("{")
+        while self._peek() not in ("}", ""):
+            key = self._decode()
+            self._expect(":")
+
+            if key == "messages":
+                self._expect("[")
+                while self._peek() not in ("]", ""):
+                    yield self._decode()
+                    self._skip_comma()
+                self._expect("]")
+            else:
+                self.header[key] = self._decode()
+
+            self._skip_comma()
+
+def export_chat_id(header: Dict[str, Any]) -> Optional[int]:
+    """Bot API style chat id of the exported chat"""
+    chat_id = header.get("id")
+    if chat_id is None:
+        return None
+    if header.get("type", "").endswith(("channel", "supergroup")):
+        return int(f"-100{chat_id}")
+    return int(chat_id)
+
+def export_text(text: Any) -> str:
+    """Flatten an exported message text, which may be split into entities"""
+    if isinstance(text, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+    return text or ""
+
+def export_media_info(message: Dict[str, Any], chat_id: int, chat_title: str) -> Optional[dict]:
+    """Map an exported message to the fields extract_media_info produces"""
+    if message.get("type") != "message":
+        return None
+
+    message_id = message["id"]
+
+    if "photo" in message:
+        media_info = {
+            "file_type": "photo",
+            "file_name": f"photo_{message_id}.jpg",
+            "file_size": message.get("photo_file_size"),
+            "width": message.get("width"),
+            "height": message.get("height")
+        }
+    elif "file" in message:
+        media_type = message.get("media_type")
+        if media_type and media_type not in EXPORT_MEDIA_TYPES:
+            return None
+        file_type = EXPORT_MEDIA_TYPES.get(media_type, "document")
+
+        # Without downloaded files the path is a "(File not included...)" note
+        file_name = message.get("file_name")
+        if not file_name and not message["file"].startswith("("):
+            file_name = os.path.basename(message["file"])
+
+        media_info = {
+            "file_type": file_type,
+            "file_name": file_name or {
+                "video": f"video_{message_id}.mp4",
+                "audio": f"audio_{message_id}.mp3",
+                "gif": f"gif_{message_id}.gif"
+            }.get(file_type, f"document_{message_id}"),
+            "file_size": message.get("file_size")
+        }
+        if file_type in ("video", "audio", "gif"):
+            media_info["duration"] = message.get("duration_seconds")
+        if file_type in ("video", "gif"):
+            media_info["width"] = message.get("width")
+            media_info["height"] = message.get("height")
+        if file_type == "document":
+            media_info["mime_type"] = message.get("mime_type")
+        if file_type == "audio":
+            media_info["performer"] = message.get("performer")
+            media_info["title"] = message.get("title")
+    else:
+        return None
+
+    if "date_unixtime" in message:
+        date = datetime.fromtimestamp(int(message["date_unixtime"]))
+    else:
+        date = datetime.fromisoformat(message["date"])
+
+    from_id = message.get("from_id") or ""
+
+    media_info.update({
+        # Placeholder until /resolve replaces the document with the real file
+        "file_unique_id": f"export:{chat_id}:{message_id}",
+        "file_id": None,
+        "needs_file_id": True,
+        "message_id": message_id,
+        "chat_id": chat_id,
+        "chat_title": chat_title,
+        "date": date,
+        "caption": export_text(message.get("text")),
+        "from_user": int(from_id[4:]) if from_id.startswith("user") else None
+    })
+    return media_info
+
+async def import_export(db: Database, path: str, chat_id: Optional[int] = None) -> Dict[str, int]:
+    """Bulk-load the media of an export; returns imported/skipped/failed counts"""
+    counts = {"imported": 0, "skipped": 0, "failed": 0}
+    top_id = 0
+    batch = []
+
+    async def flush_batch():
+        # Posts already indexed from Telegram keep their real document
+        indexed = await db.get_indexed_message_ids(chat_id, [media["message_id"] for media in batch])
+        pending = [media for media in batch if media["message_id"] not in indexed]
+        inserted, failed = await db.save_media_batch(pending)
+        counts["imported"] += len(inserted)
+        counts["failed"] += len(failed)
+        counts["skipped"] += len(batch) - len(inserted) - len(failed)
+        logger.info(f"Imported {counts['imported']:,} files so far")
+        batch.clear()
+
+    with open(path, encoding="utf-8") as fp:
+        reader = ExportReader(fp)
+        for message in reader.messages():
+            if chat_id is None:
+                chat_id = export_chat_id(reader.header)
+                if chat_id is None:
+                    raise ValueError("Export has no chat id; pass --chat-id")
+
+            top_id = max(top_id, message.get("id", 0))
+            media_info = export_media_info(message, chat_id, reader.header.get("name") or "Unknown Chat")
+            if not media_info:
+                continue
+
+            batch.append(media_info)
+            if len(batch) >= Config.INDEX_BATCH_SIZE:
+                await flush_batch()
+
+    if batch:
+        await flush_batch()
+
+    # The export covers the history up to top_id, so /index only reads newer posts.
+    # After failed writes it doesn't, and /index has to read the whole history again.
+    if chat_id is not None and top_id and not counts["failed"]:
+        checkpoint = await db.get_index_checkpoint(chat_id) or {}
+        if checkpoint.get("status") != "running" and checkpoint.get("top_id", 0) < top_id:
+            await db.save_index_checkpoint(chat_id, {
+                "chat_title": reader.header.get("name"),
+                "status": "done",
+                "top_id": top_id,
+                "run_top": None,
+                "run_cursor": None
+            })
+
+    return counts
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import a Telegram Desktop channel export into the media index")
+    parser.add_argument("path", help="path to the export's result.json")
+    parser.add_argument("--chat-id", type=int, help="chat id to store, if the export's own id should not be used")
+    args = parser.parse_args()
+
+    db = Database()
+    await db.connect()
+    try:
+        counts = await import_export(db, args.path, args.chat_id)
+        logger.info(
+            f"Import complete: {counts['imported']:,} imported, {counts['skipped']:,} skipped, "
+            f"{counts['failed']:,} failed. "
+            "Run /resolve in the bot to make them searchable."
+        )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(main())
@@ -0,0 +1,294 @@
+"""
+Background Indexing Jobs
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from pyrogram.errors import FloodWait
+from pyrogram.types import Message
+from config import Config
+from utils import BatchWriter, extract_media_info, ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+# Telegram returns at most 200 messages per get_messages call
+RESOLVE_BATCH_SIZE = 200
+
+class BackfillJob:
+    """State of one channel backfill"""
+
+    def __init__(self, chat_id: int, chat_title: str, progress: Optional[ProgressReporter] = None, kind: str = "index"):
+        self.chat_id = chat_id
+        self.chat_title = chat_title
+        self.kind = kind
+        self.progress = progress
+        self.state = "queued"
+        self.indexed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def processed(self) -> int:
+        return self.indexed + self.skipped + self.errors
+
+    def summary(self) -> str:
+        return (
+            f"✅ Indexed: {self.indexed:,}\n"
+            f"⏭ Skipped: {self.skipped:,}\n"
+            f"❌ Errors: {self.errors:,}\n"
+            f"📊 Processed: {self.processed:,}"
+        )
+
+class BackfillManager:
+    """Runs channel backfills in the background with persisted per-channel checkpoints.
+    
+    Also resolves the file ids of media imported from Desktop exports, one
+    job per channel at a time either way.
+
+    History is read newest to oldest. A checkpoint records `top_id`, below which
+    everything is indexed, plus the `run_top`/`run_cursor` window of an unfinished
+    run, so a restarted or rate-limited job resumes where it stopped and a
+    re-index only reads messages newer than the last completed run.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.jobs: Dict[int, BackfillJob] = {}
+        self.semaphore = asyncio.Semaphore(Config.BACKFILL_CONCURRENCY)
+
+    def is_running(self, chat_id: int) -> bool:
+        job = self.jobs.get(chat_id)
+        return bool(job and job.task and not job.task.done())
+
+    def submit(self, chat_id: int, chat_title: str, status_msg: Optional[Message] = None) -> bool:
+        """Queue a backfill for a channel; returns False if one is already active"""
+        if self.is_running(chat_id):
+            return False
+
+        job = BackfillJob(chat_id, chat_title, self._progress(status_msg))
+        job.task = asyncio.create_task(self._run(job))
+        self.jobs[chat_id] = job
+        return True
+
+    def submit_resolve(self, chat_id: int, chat_title: str, status_msg: Optional[Message] = None) -> bool:
+        """Queue file id resolution for a channel's imported media; returns False if a job is active"""
+        if self.is_running(chat_id):
+            return False
+
+        job = BackfillJob(chat_id, chat_title, self._progress(status_msg), kind="resolve")
+        job.task = asyncio.create_task(self._resolve(job))
+        self.jobs[chat_id] = job
+        return True
+
+    def cancel(self, chat_id: int) -> bool:
+        """Cancel an active backfill, keeping its checkpoint"""
+        if not self.is_running(chat_id):
+            return False
+        job = self.jobs[chat_id]
+        job.cancel_requested = True
+        job.task.cancel()
+        return True
+
+    def list_jobs(self) -> List[BackfillJob]:
+        return list(self.jobs.values())
+
+    async def resume_pending(self):
+        """Restart backfills that were interrupted by a restart"""
+        for checkpoint in await self.client.db.get_index_checkpoints(status="running"):
+            chat_id = checkpoint["_id"]
+            logger.info(f"Resuming backfill of {checkpoint.get('chat_title') or chat_id}")
+            self.submit(chat_id, checkpoint.get("chat_title") or str(chat_id))
+
+    async def stop(self):
+        """Cancel all jobs; their checkpoints stay "running" so they resume on next start"""
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _progress(self, status_msg: Optional[Message]) -> Optional[ProgressReporter]:
+        return ProgressReporter.for_message(self.client, status_msg) if status_msg else None
+
+    def _report(self, job: BackfillJob, header: str):
+        """Refresh the job's status message in the background"""
+        if job.progress:
+            job.progress.update(f"{header}\n\n{job.summary()}")
+
+    async def _finish(self, job: BackfillJob, header: str):
+        """Show the job's final status"""
+        if job.progress:
+            await job.progress.finish(f"{header}\n\n{job.summary()}")
+
+    async def _run(self, job: BackfillJob):
+        db = self.client.db
+        async with self.semaphore:
+            job.state = "running"
+            checkpoint = await db.get_index_checkpoint(job.chat_id) or {}
+            top_id = checkpoint.get("top_id", 0)
+            run_top = checkpoint.get("run_top")
+            cursor = checkpoint.get("run_cursor") or 0
+            batch = []
+
+            async def flush(last_id: int):
+                """Save the batch, then move the checkpoint cursor past it.
+                
+                A batch with failed writes fails the job instead, leaving the
+                cursor before it so the next run reads those posts again.
+                """
+                nonlocal cursor
+                if batch:
+                    inserted, failed = await db.save_media_batch(batch)
+                    job.indexed += len(inserted)
+                    job.skipped += len(batch) - len(inserted) - len(failed)
+                    for media_info in inserted:
+                        self.client.percolator.submit(media_info)
+                    # Whatever is left in the batch is counted as errors when the job fails
+                    batch[:] = failed
+                    if failed:
+                        raise RuntimeError(f"{len(failed)} files could not be saved")
+                if last_id:
+                    cursor = last_id
+                await db.save_index_checkpoint(job.chat_id, {
+                    "chat_title": job.chat_title,
+                    "status": "running",
+                    "top_id": top_id,
+                    "run_top": run_top,
+                    "run_cursor": cursor
+                })
+
+            self._report(job, f"🔄 <b>Indexing: {job.chat_title}</b>")
+
+            try:
+                while True:
+                    last_id = 0
+                    try:
+                        async for msg in self.client.get_chat_history(job.chat_id, offset_id=cursor):
+                            if msg.id <= top_id:
+                                break
+                            if run_top is None:
+                                run_top = msg.id
+                            last_id = msg.id
+
+                            media_info = extract_media_info(msg) if not msg.empty else None
+                            if media_info:
+                                batch.append(media_info)
+                            else:
+                                job.skipped += 1
+
+                            if len(batch) >= Config.INDEX_BATCH_SIZE:
+                                await flush(last_id)
+                                self._report(job, f"🔄 <b>Indexing: {job.chat_title}</b>")
+                        break
+                    except FloodWait as e:
+                        await flush(last_id)
+                        logger.warning(f"FloodWait of {e.value}s while indexing {job.chat_title}, resuming after it")
+                        self._report(job, f"⏳ <b>Indexing: {job.chat_title}</b>\nRate limited, resuming in {e.value}s")
+                        await asyncio.sleep(e.value)
+
+                await flush(last_id)
+
+                # The whole window down to the previous top is indexed now
+                top_id = max(top_id, run_top or 0)
+                await db.save_index_checkpoint(job.chat_id, {
+                    "chat_title": job.chat_title,
+                    "status": "done",
+                    "top_id": top_id,
+                    "run_top": None,
+                    "run_cursor": None
+                })
+                job.state = "done"
+                logger.info(f"Backfill of {job.chat_title} complete: {job.indexed} new files")
+                await self._finish(job, f"✅ <b>Indexing Complete: {job.chat_title}</b>")
+
+            except asyncio.CancelledError:
+                # Keep the saved cursor; only an admin cancel stops it from resuming on restart
+                if job.cancel_requested:
+                    job.state = "cancelled"
+                    await db.save_index_checkpoint(job.chat_id, {"status": "cancelled"})
+                    await self._finish(job, f"🛑 <b>Indexing Cancelled: {job.chat_title}</b>")
+                else:
+                    job.state = "interrupted"
+                raise
+            except Exception as e:
+                # The saved cursor is still before the unsaved batch, so /index resumes from it
+                job.state = "failed"
+                job.errors += len(batch)
+                logger.error(f"Backfill of {job.chat_title} failed: {e}")
+                await db.save_index_checkpoint(job.chat_id, {"status": "failed"})
+                await self._finish(job, f"❌ <b>Indexing Failed: {job.chat_title}</b>\n{e}")
+
+    async def _resolve(self, job: BackfillJob):
+        """Replace imported placeholders with the real media of their posts"""
+        db = self.client.db
+        async with self.semaphore:
+            job.state = "running"
+            self._report(job, f"🔄 <b>Resolving: {job.chat_title}</b>")
+
+            try:
+                message_ids = await db.get_unresolved_message_ids(job.chat_id)
+                for start in range(0, len(message_ids), RESOLVE_BATCH_SIZE):
+                    chunk = message_ids[start:start + RESOLVE_BATCH_SIZE]
+                    while True:
+                        try:
+                            messages = await self.client.get_messages(job.chat_id, chunk)
+                            break
+                        except FloodWait as e:
+                            logger.warning(f"FloodWait of {e.value}s while resolving {job.chat_title}, resuming after it")
+                            await asyncio.sleep(e.value)
+
+                    for msg in messages:
+                        media_info = extract_media_info(msg) if not msg.empty else None
+                        if not media_info:
+                            # The post was deleted or lost its media since the export
+                            await db.delete_media(job.chat_id, msg.id)
+                            job.skipped += 1
+                        elif await db.upsert_media(media_info):
+                            job.indexed += 1
+                            self.client.percolator.submit(media_info)
+                        else:
+                            job.errors += 1
+
+                    self._report(job, f"🔄 <b>Resolving: {job.chat_title}</b>")
+
+                job.state = "done"
+                logger.info(f"Resolved {job.indexed} imported files of {job.chat_title}")
+                await self._finish(job, f"✅ <b>Resolving Complete: {job.chat_title}</b>")
+
+            except asyncio.CancelledError:
+                # Resolution is idempotent; /resolve picks up whatever is left
+                job.state = "cancelled" if job.cancel_requested else "interrupted"
+                await self._finish(job, f"🛑 <b>Resolving Stopped: {job.chat_title}</b>")
+                raise
+            except Exception as e:
+                job.state = "failed"
+                logger.error(f"Resolving {job.chat_title} failed: {e}")
+                await self._finish(job, f"❌ <b>Resolving Failed: {job.chat_title}</b>\n{e}")
+
+class IngestBuffer(BatchWriter):
+    """Write-behind queue for live channel posts, saved to MongoDB in batches.
+    
+    The channel handler only enqueues, so a burst of uploads costs a few bulk
+    writes instead of one round-trip per file on the update workers. Unlike
+    search logs, media is never dropped: a full queue makes the handler wait,
+    and failed writes are retried.
+    """
+    
+    def __init__(self, client):
+        super().__init__(Config.INGEST_QUEUE_SIZE, Config.INGEST_BATCH_SIZE, Config.INGEST_FLUSH_INTERVAL)
+        self.client = client
+        self.flushed = 0
+    
+    async def put(self, media_info: Dict[str, Any]):
+        """Enqueue media for the next batch"""
+        await self.queue.put(media_info)
+    
+    async def write(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        inserted, failed = await self.client.db.save_media_batch(batch)
+        self.flushed += len(inserted)
+        for media_info in inserted:
+            self.client.percolator.submit(media_info)
+        logger.info(f"Indexed {len(inserted)} of {len(batch)} queued files")
+        return failed
@@ -0,0 +1,46 @@
+import unittest
+
+from cache import KnownKeySet
+
+
+class KnownKeySetLoadTest(unittest.TestCase):
+    def test_discard_during_load_survives_merge_threshold(self):
+        known = KnownKeySet(merge_threshold=3)
+        known.discard("a")
+        known.add("b")
+        known.add("c")
+
+        known.load([KnownKeySet.hash_key("a")])
+
+        self.assertNotIn("a", known)
+        self.assertIn("b", known)
+        self.assertIn("c", known)
+
+    def test_changes_during_reload_are_kept(self):
+        known = KnownKeySet(merge_threshold=2)
+        known.load([KnownKeySet.hash_key(key) for key in ("a", "b")])
+
+        known.begin_load()
+        known.discard("a")
+        known.add("c")
+        known.add("d")
+        known.load([KnownKeySet.hash_key(key) for key in ("a", "b")])
+
+        self.assertNotIn("a", known)
+        self.assertIn("b", known)
+        self.assertIn("c", known)
+        self.assertIn("d", known)
+
+    def test_reload_drops_keys_removed_elsewhere(self):
+        known = KnownKeySet()
+        known.load([KnownKeySet.hash_key(key) for key in ("a", "b")])
+
+        known.begin_load()
+        known.load([KnownKeySet.hash_key("b")])
+
+        self.assertNotIn("a", known)
+        self.assertIn("b", known)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,13 +2,42 @@
 Utility Functions
 """
 
+import asyncio
 import logging
-from typing import Optional, List
+import re
+import unicodedata
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import FloodWait, MessageNotModified, UserNotParticipant
 from pyrogram.types import Message, User
+from cache import TTLCache
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Naive datetimes coming back from MongoDB are UTC
+EPOCH = datetime(1970, 1, 1)
+
+# Auth channel membership per user; misses are kept shorter so new joiners get in quickly
+membership_cache = TTLCache(100_000, Config.SUBSCRIPTION_CACHE_TTL)
+
+# Combined subscription + authorization decision per user for the inline hot path
+access_cache = TTLCache(100_000, Config.ACCESS_CACHE_TTL)
+
+# Rendered inline results per file_unique_id, so repeated hits skip rebuilding them
+result_cache = TTLCache(Config.RESULT_CACHE_SIZE, Config.RESULT_CACHE_TTL)
+
+ACCESS_GRANTED = "granted"
+ACCESS_UNSUBSCRIBED = "unsubscribed"
+ACCESS_UNAUTHORIZED = "unauthorized"
+
+# Word characters without the underscore, so "Movie_Name.2023" splits into three tokens
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format"""
     if size_bytes == 0:
@@ -22,6 +51,246 @@ def format_file_size(size_bytes: int) -> str:
     
     return f"{size_bytes:.1f} {size_names[i]}"
 
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized search tokens (NFKC + casefold)"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold())
+
+def query_tokens(query: str) -> List[str]:
+    """Tokenize a search query, dropping repeated words but keeping their order"""
+    return list(dict.fromkeys(tokenize(query)))
+
+def matches_query_tokens(tokens, media_tokens) -> bool:
+    """Check whether media with the given tokens is a hit for a tokenized query.
+
+    Mirrors Database.search_media: every word must match exactly except the last,
+    which only has to be a prefix of some media token.
+    """
+    if not tokens:
+        return True
+    *full_tokens, last_token = tokens
+    media_tokens = set(media_tokens)
+    if not media_tokens.issuperset(full_tokens):
+        return False
+    return any(token.startswith(last_token) for token in media_tokens)
+
+class MediaTokenIndex:
+    """Token to media map over a batch of documents, for matching many queries against it"""
+    
+    def __init__(self, token_lists):
+        self.by_token = {}
+        for position, media_tokens in enumerate(token_lists):
+            for token in media_tokens:
+                self.by_token.setdefault(token, set()).add(position)
+        self.sorted_tokens = sorted(self.by_token)
+    
+    def first_match(self, tokens) -> Optional[int]:
+        """Position of the first document matching a tokenized query, as matches_query_tokens decides"""
+        if not tokens:
+            return None
+        *full_tokens, last_token = tokens
+        
+        candidates = None
+        for token in full_tokens:
+            positions = self.by_token.get(token)
+            if not positions:
+                return None
+            candidates = positions if candidates is None else candidates & positions
+            if not candidates:
+                return None
+        
+        # Tokens starting with the last word sit next to each other in sorted order
+        matches = set()
+        for index in range(bisect_left(self.sorted_tokens, last_token), len(self.sorted_tokens)):
+            token = self.sorted_tokens[index]
+            if not token.startswith(last_token):
+                break
+            positions = self.by_token[token]
+            matches.update(positions if candidates is None else positions & candidates)
+        return min(matches) if matches else None
+
+def encode_search_cursor(media: dict) -> str:
+    """Encode the (date, _id) position of a search result as an inline query offset"""
+    date = media["date"]
+    if date.tzinfo:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    millis = (date - EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}:{media['_id']}"
+
+def decode_search_cursor(offset: str) -> Optional[Tuple[datetime, ObjectId]]:
+    """Decode an inline query offset back into a (date, _id) position"""
+    if not offset:
+        return None
+    try:
+        millis, object_id = offset.split(":", 1)
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(object_id)
+    except (ValueError, InvalidId):
+        logger.debug(f"Ignoring invalid search cursor: {offset}")
+        return None
+
+async def run_periodically(interval: float, func, name: str):
+    """Call an async function every interval seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await func()
+        except Exception as e:
+            logger.error(f"Error in periodic task {name}: {e}")
+
+class BatchWriter:
+    """Write-behind queue saved by a background writer task in batches.
+    
+    Producers only enqueue; the writer calls write() when a batch fills up or
+    the flush interval passes since its first item. write() returns the items
+    that have to be written again, which stay at the head of the next batch
+    and are retried with exponential backoff, as is a batch whose write raised.
+    """
+    
+    RETRY_DELAY = 1
+    MAX_RETRY_DELAY = 60
+    
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._batch: list = []
+        self._retry_delay = 0
+        self._writer: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Future] = None
+    
+    def start(self):
+        """Start the background writer"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the writer and write everything still queued"""
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        
+        await self.flush()
+        if self._batch:
+            logger.error(f"{type(self).__name__} stopped with {len(self._batch)} unwritten items")
+    
+    async def flush(self):
+        """Write queued items now"""
+        # Let a flush already in progress finish its write first
+        if self._flushing:
+            await asyncio.shield(self._flushing)
+        
+        while not self.queue.empty():
+            self._batch.append(self.queue.get_nowait())
+        await self._flush()
+    
+    async def write(self, batch: list) -> list:
+        """Write a batch; returns the items to write again later"""
+        raise NotImplementedError
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._retry_delay:
+                await asyncio.sleep(self._retry_delay)
+            if not self._batch:
+                self._batch.append(await self.queue.get())
+            deadline = loop.time() + self.flush_interval
+            
+            while len(self._batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            self._flushing = asyncio.ensure_future(self._flush())
+            await asyncio.shield(self._flushing)
+    
+    async def _flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        
+        try:
+            retry = await self.write(batch)
+        except Exception as e:
+            logger.error(f"{type(self).__name__} failed to write {len(batch)} items: {e}")
+            retry = batch
+        
+        if retry:
+            self._batch[:0] = retry
+            self._retry_delay = min(self._retry_delay * 2 or self.RETRY_DELAY, self.MAX_RETRY_DELAY)
+            logger.warning(f"{type(self).__name__} retrying {len(retry)} items in {self._retry_delay}s")
+        else:
+            self._retry_delay = 0
+
+class ProgressReporter:
+    """Status message for a long admin operation, edited in the background.
+    
+    update() only records the latest text; a background task edits the
+    message at most once every `interval` seconds and skips unchanged text,
+    so the operation never waits on its own status or on a FloodWait in the
+    admin chat. finish() cancels pending edits and shows the final text.
+    """
+    
+    def __init__(self, client, chat_id: int, message_id: int, interval: float = None):
+        self.client = client
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = Config.PROGRESS_EDIT_INTERVAL if interval is None else interval
+        self._latest = None
+        self._shown = None
+        self._last_edit = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def for_message(cls, client, message: Message, interval: float = None) -> "ProgressReporter":
+        return cls(client, message.chat.id, message.id, interval)
+    
+    def update(self, text: str):
+        """Schedule the message to show text"""
+        self._latest = text
+        if text != self._shown and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._drain())
+    
+    async def finish(self, text: str):
+        """Show the final text now"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._latest = text
+        while text != self._shown:
+            await self._edit(text)
+    
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self._latest != self._shown:
+            wait = self._last_edit + self.interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._edit(self._latest)
+    
+    async def _edit(self, text: str):
+        try:
+            await self.client.edit_message_text(self.chat_id, self.message_id, text)
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
+            return
+        except MessageNotModified:
+            pass
+        except Exception as e:
+            # Deleted or inaccessible status messages are not worth retrying
+            logger.debug(f"Could not update status message {self.message_id}: {e}")
+        self._shown = text
+        self._last_edit = asyncio.get_running_loop().time()
+
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
     return user_id in Config.ADMINS
@@ -36,16 +305,80 @@ async def is_authorized_user(user_id: int, client) -> bool:
         return True
     return user_id in Config.AUTH_USERS or is_admin(user_id)
 
-async def is_subscribed(client, user_id: int) -> bool:
-    """Check if user is subscribed to auth channel"""
+async def is_subscribed(client, user_id: int, force: bool = False) -> bool:
+    """Check if user is subscribed to auth channel, using the membership cache unless forced"""
+    return bool(await lookup_membership(client, user_id, force))
+
+async def lookup_membership(client, user_id: int, force: bool = False) -> Optional[bool]:
+    """Auth channel membership of a user, or None when Telegram could not be asked"""
     if not Config.AUTH_CHANNEL:
         return True
     
+    if force:
+        # The combined access decision was derived from the stale membership
+        access_cache.pop(user_id)
+    else:
+        cached = membership_cache.get(user_id)
+        if cached is not None:
+            return cached
+    
     try:
         member = await client.get_chat_member(Config.AUTH_CHANNEL, user_id)
-        return member.status not in ["kicked", "left"]
-    except Exception:
-        return False
+        subscribed = member.status not in (ChatMemberStatus.BANNED, ChatMemberStatus.LEFT)
+    except UserNotParticipant:
+        subscribed = False
+    except Exception as e:
+        # Don't cache transient API errors
+        logger.debug(f"Membership check failed for {user_id}: {e}")
+        return None
+    
+    membership_cache.set(
+        user_id, subscribed,
+        ttl=None if subscribed else Config.SUBSCRIPTION_NEGATIVE_CACHE_TTL
+    )
+    return subscribed
+
+def forget_membership(user_id: int):
+    """Drop a cached membership so the next check asks Telegram again"""
+    membership_cache.pop(user_id)
+    access_cache.pop(user_id)
+
+async def check_access(client, user_id: int) -> str:
+    """Run the subscription and authorization checks concurrently and cache the decision"""
+    decision = access_cache.get(user_id)
+    if decision is not None:
+        return decision
+    
+    subscribed, authorized = await asyncio.gather(
+        lookup_membership(client, user_id),
+        is_authorized_user(user_id, client)
+    )
+    
+    if subscribed is None:
+        # The membership lookup failed; deny this query only, without caching it
+        return ACCESS_UNSUBSCRIBED
+    
+    if not subscribed:
+        decision = ACCESS_UNSUBSCRIBED
+    elif not authorized:
+        decision = ACCESS_UNAUTHORIZED
+    else:
+        decision = ACCESS_GRANTED
+    
+    # Denials are kept short so users who just joined or got unbanned get in quickly
+    access_cache.set(
+        user_id, decision,
+        ttl=None if decision == ACCESS_GRANTED else min(Config.ACCESS_CACHE_TTL, Config.SUBSCRIPTION_NEGATIVE_CACHE_TTL)
+    )
+    return decision
+
+def forget_inline_result(file_unique_id: str):
+    """Drop the rendered inline result of a media document, e.g. after its post was edited"""
+    result_cache.pop(file_unique_id)
+
+def forget_access(user_id: int):
+    """Drop a cached access decision, e.g. after a ban or unban"""
+    access_cache.pop(user_id)
 
 def extract_media_info(message: Message) -> Optional[dict]:
     """Extract media information from message"""